@@ -1,3 +1,155 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, transaction, models as db_models
+from django.http import QueryDict
+from django.test import TestCase, RequestFactory
+
+from kingadmin.service.sites import site, ModelAdmin
+from kingadmin.settings import admin_settings
+from kingadmin.utils.paginator import Paginator, KeysetPaginator
+from kingadmin.utils.search import DatabaseSearchBackend, SQLiteFTSSearchBackend
+
+from app01 import models
+
+
+class NullableRank(db_models.Model):
+    """
+    排序字段可以为空的测试模型
+    """
+    rank = db_models.IntegerField(null=True)
+
+    class Meta:
+        app_label = "app01"
+
+
+class DatabaseSearchBackendTests(TestCase):
+    def setUp(self):
+        self.publisher = models.Publisher.objects.create(name="人民出版社")
+        models.Publisher.objects.create(name="北京出版社")
+        self.admin = site._registry[models.Publisher]
+        self.backend = DatabaseSearchBackend()
+        self.request = RequestFactory().get("/")
+
+    def search(self, list_search, keyword):
+        queryset = models.Publisher.objects.all()
+        with mock.patch.object(self.admin, "list_search", list_search):
+            return self.backend.search(self.admin, self.request, queryset, keyword)
+
+    def test_empty_list_search_returns_queryset(self):
+        self.assertEqual(self.search([], "人民").count(), 2)
+
+    def test_number_lookup(self):
+        self.assertEqual(list(self.search(["#id"], str(self.publisher.pk))), [self.publisher])
+
+    def test_number_lookup_skips_invalid_value(self):
+        # 整数字段搜索小数 跳过该字段 不抛出异常
+        self.assertEqual(self.search(["#id"], "1.5").count(), 0)
+        self.assertEqual(list(self.search(["#id", "name"], "人民")), [self.publisher])
+
+    def test_exact_lookup_skips_invalid_value(self):
+        # 精确匹配非文本字段 关键字类型不匹配时跳过该字段
+        self.assertEqual(list(self.search(["name", "=id"], "人民")), [self.publisher])
+        self.assertEqual(list(self.search(["=id"], str(self.publisher.pk))), [self.publisher])
+
+        book = models.Book.objects.create(title="红楼梦", publisher=self.publisher)
+        book_admin = site._registry[models.Book]
+        with mock.patch.object(book_admin, "list_search", ["title", "=publisher"]):
+            queryset = models.Book.objects.all()
+            self.assertEqual(list(self.backend.search(book_admin, self.request, queryset, "红楼")), [book])
+            self.assertEqual(list(self.backend.search(book_admin, self.request, queryset,
+                                                      str(self.publisher.pk))), [book])
+
+
+class SQLiteFTSSearchBackendTests(TestCase):
+    def setUp(self):
+        self.admin = site._registry[models.Publisher]
+        self.backend = SQLiteFTSSearchBackend()
+
+    def test_register_requires_sqlite(self):
+        connection = self.backend.get_connection(self.admin)
+        with mock.patch.object(connection, "vendor", "postgresql"):
+            with self.assertRaises(ImproperlyConfigured):
+                self.backend.register(self.admin)
+
+        with mock.patch.object(connection.Database, "sqlite_version_info", (3, 31, 1)):
+            with self.assertRaises(ImproperlyConfigured):
+                self.backend.register(self.admin)
+
+    def test_ensure_table_retries_after_failure(self):
+        # rowid 是 fts5 保留的列名 建表失败
+        with mock.patch.object(self.backend, "get_index_fields", return_value=["rowid"]):
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                self.backend.ensure_table(self.admin)
+        self.assertEqual(self.backend._tables, set())
+
+        with mock.patch.object(self.backend, "get_index_fields", return_value=["name"]):
+            self.backend.ensure_table(self.admin)
+        self.assertEqual(len(self.backend._tables), 1)
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        # city 只有3个值 大量相同的排序值
+        for i in range(10):
+            models.Publisher.objects.create(name=f"p{i}", city=i % 3 + 1)
+        self.pks = set(models.Publisher.objects.values_list("pk", flat=True))
+
+    def get_paginator(self, ordering, cursor=None):
+        params = QueryDict(mutable=True)
+        if cursor:
+            params[admin_settings.CURSOR_QUERY] = cursor
+        return KeysetPaginator(models.Publisher.objects.all(), ordering, params)
+
+    def walk(self, ordering):
+        """
+        从第一页按下一页游标翻到最后一页，再按上一页游标翻回第一页
+        :return: (向后翻页每页的主键, 向前翻页每页的主键)
+        """
+        forward, backward = [], []
+        paginator = self.get_paginator(ordering)
+        for _ in range(len(self.pks)):
+            forward.append([instance.pk for instance in paginator.get_page()])
+            next_cursor = paginator.get_cursors()[1]
+            if not next_cursor:
+                break
+            paginator = self.get_paginator(ordering, next_cursor)
+
+        for _ in range(len(self.pks)):
+            previous_cursor = paginator.get_cursors()[0]
+            if not previous_cursor:
+                break
+            paginator = self.get_paginator(ordering, previous_cursor)
+            backward.append([instance.pk for instance in paginator.get_page()])
+        return forward, backward
+
+    def assert_each_once(self, pages):
+        pks = [pk for page in pages for pk in page]
+        self.assertEqual(sorted(pks), sorted(self.pks))
+
+    def test_tied_ordering(self):
+        for ordering in (["-city"], ["city"], ["city", "-name"], ["-city", "-pk"]):
+            forward, backward = self.walk(ordering)
+            self.assert_each_once(forward)
+            # 向前翻页 不包含最后一页
+            self.assert_each_once(backward + forward[-1:])
+
+    def test_nullable_ordering_uses_offset_paginator(self):
+        for i in range(10):
+            NullableRank.objects.create(rank=None if i % 2 else i % 3)
+        self.assertIsNone(KeysetPaginator.resolve_ordering(NullableRank, ["rank"]))
+
+        admin_class = ModelAdmin(NullableRank, site)
+        admin_class.keyset_pagination = True
+        admin_class.list_order = ["rank"]
+        queryset = NullableRank.objects.order_by("rank", "pk")
+
+        request = RequestFactory().get("/")
+        paginator = admin_class.get_paginator(request, queryset)
+        self.assertIsInstance(paginator, Paginator)
+
+        pks = []
+        for page in range(1, paginator.max_page_num + 1):
+            request = RequestFactory().get("/", {admin_settings.PAGE_QUERY: page})
+            pks += [instance.pk for instance in admin_class.get_paginator(request, queryset).get_page()]
+        self.assertEqual(sorted(pks), sorted(NullableRank.objects.values_list("pk", flat=True)))
@@ -5,8 +5,12 @@
 # @Date     :2019/9/8
 
 import inspect
+import threading
+import weakref
+from collections import OrderedDict
 
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Model
 from django.template import loader
 from django.utils import six
 from django.utils.safestring import mark_safe
@@ -39,6 +43,27 @@ def is_simple_callable(obj):
     )
 
 
+# {函数对象: 是否可以无参数调用} 同一个类的方法 共用同一个函数对象 只检查一次签名
+_simple_callable_cache = weakref.WeakKeyDictionary()
+
+
+def is_simple_callable_cached(obj):
+    """
+    与 `is_simple_callable` 相同，按函数对象缓存结果，避免每次都执行 inspect.signature
+    """
+    if inspect.ismethod(obj):
+        func = obj.__func__
+    elif inspect.isfunction(obj):
+        func = obj
+    else:
+        return False
+
+    result = _simple_callable_cache.get(func)
+    if result is None:
+        result = _simple_callable_cache[func] = is_simple_callable(obj)
+    return result
+
+
 def get_attribute(instance, attrs):
     """
     Similar to Python's built in `getattr(instance, attr)`,
@@ -55,7 +80,7 @@ def get_attribute(instance, attrs):
         except ObjectDoesNotExist:
             return None
 
-        if is_simple_callable(instance):
+        if is_simple_callable_cached(instance):
             try:
                 instance = instance()
             except (AttributeError, KeyError) as exc:
@@ -65,6 +90,21 @@ def get_attribute(instance, attrs):
     return instance
 
 
+def compile_attribute(attrs):
+    """
+    将属性路径编译成取值函数 在 Field.bind 时调用一次
+    :param attrs: 属性列表 eg: ["editorial_staff", "first", "name"]
+    :return: 取值函数 accessor(instance)
+    """
+    attrs = tuple(attrs)
+
+    if not attrs:
+        # source="*" 使用整个实例
+        return lambda instance: instance
+
+    return lambda instance: get_attribute(instance, attrs)
+
+
 class Field(object):
 
     def __init__(self, default=Empty, initial=Empty, source=None,
@@ -83,6 +123,7 @@ class Field(object):
         self.field_name = None
         self.parent = None
         self.source_attrs = []
+        self.accessor = None
 
     def bind(self, field_name, parent):
         """
@@ -115,8 +156,12 @@ class Field(object):
         else:
             self.source_attrs = self.source.split(".")
 
+        self.accessor = compile_attribute(self.source_attrs)
+
     def get_attribute(self, instance):
-        return get_attribute(instance, self.source_attrs)
+        if self.accessor is None:
+            return get_attribute(instance, self.source_attrs)
+        return self.accessor(instance)
 
     def to_representation(self, value):
         """自定义方法接口
@@ -141,24 +186,88 @@ class StringField(Field):
         return six.text_type(value)
 
 
-class HtmlField(Field):
+class FragmentCache(object):
+    """
+    渲染结果的 LRU 缓存，按单元格的值缓存，超过容量时淘汰最久未使用的值
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # 复制 Field 时 使用新的空缓存 锁不能被复制
+        return self.__class__(self.maxsize)
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                self.data.move_to_end(key)
+            except KeyError:
+                return default
+            return self.data[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+
+class FragmentCacheMixin(object):
+    """
+    cache_size 大于0时 缓存单元格渲染结果，适用于重复值很多的列 eg: 图片、状态标签
+    只适用于不可变的普通值(字符串、数字等)，模型对象按主键比较 修改后缓存不会失效，不缓存
+    子类实现 render(value)
+    """
+
+    def __init__(self, cache_size=0, **kwargs):
+        self.fragment_cache = FragmentCache(cache_size) if cache_size else None
+        super(FragmentCacheMixin, self).__init__(**kwargs)
+
+    def render(self, value):
+        raise NotImplementedError
+
+    def to_representation(self, value):
+        if self.fragment_cache is None or isinstance(value, Model):
+            return self.render(value)
+
+        # 区分 1 和 True 等相等但展示不同的值
+        key = (value.__class__, value)
+        try:
+            html = self.fragment_cache.get(key)
+        except TypeError:
+            # 不可哈希的值不缓存
+            return self.render(value)
+
+        if html is None:
+            html = self.render(value)
+            self.fragment_cache.set(key, html)
+        return html
+
+
+class HtmlField(FragmentCacheMixin, Field):
 
     def __init__(self, template=None, **kwargs):
         self.template = template
+        self._template = None
         super(HtmlField, self).__init__(**kwargs)
 
-    def to_representation(self, value):
-        return mark_safe(
-            loader.render_to_string(
-                self.template,
-                context={
-                    self.field_name: value
-                }
-            )
-        )
+    def get_template(self):
+        """
+        只查找加载一次模板 之后每个单元格复用同一个模板对象
+        """
+        if self._template is None:
+            self._template = loader.get_template(self.template)
+        return self._template
 
+    def render(self, value):
+        return mark_safe(self.get_template().render({self.field_name: value}))
 
-class ImgHtmlField(Field):
+
+class ImgHtmlField(FragmentCacheMixin, Field):
     """img path field
 
     """
@@ -168,7 +277,7 @@ class ImgHtmlField(Field):
         self.width, self.height = width, height
         super(ImgHtmlField, self).__init__(**kwargs)
 
-    def to_representation(self, value):
+    def render(self, value):
         return f"<img src='{self.img_domain}{value if value.startswith('') else f'/{value}'}' " \
                f"width={self.width} height={self.height} />"
 
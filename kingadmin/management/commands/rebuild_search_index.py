@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from kingadmin.service.sites import site
+from kingadmin.utils.search import IndexSearchBackend
+
+
+class Command(BaseCommand):
+    help = "重建 kingadmin 索引搜索后端的搜索索引"
+
+    def add_arguments(self, parser):
+        parser.add_argument("models", nargs="*", help="app_label.model_name 默认所有使用索引搜索的模型")
+
+    def handle(self, *args, **options):
+        labels = {label.lower() for label in options["models"]}
+
+        admins = [
+            admin_class for model, admin_class in site._registry.items()
+            if isinstance(admin_class._search_backend, IndexSearchBackend)
+            and (not labels or model._meta.label_lower in labels)
+        ]
+        if labels and len(admins) != len(labels):
+            raise CommandError("模型未注册或未使用索引搜索后端")
+
+        for admin_class in admins:
+            admin_class._search_backend.rebuild(admin_class)
+            self.stdout.write(f"{admin_class.model._meta.label} 索引重建完成")
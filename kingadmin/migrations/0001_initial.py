@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:14
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField(verbose_name='数据主键')),
+                ('field', models.CharField(max_length=100, verbose_name='搜索字段')),
+                ('token', models.CharField(max_length=20, verbose_name='词')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType', verbose_name='模型')),
+            ],
+            options={
+                'verbose_name': '搜索索引',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='searchtoken',
+            index_together=set([('content_type', 'token'), ('content_type', 'object_id')]),
+        ),
+    ]
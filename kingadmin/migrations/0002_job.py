@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:29
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('kingadmin', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=100, verbose_name='批量操作')),
+                ('params', models.TextField(blank=True, default='', verbose_name='请求参数')),
+                ('status', models.CharField(choices=[('pending', '等待执行'), ('running', '执行中'), ('success', '成功'), ('failed', '失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='已处理条数')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='总条数')),
+                ('result', models.TextField(blank=True, default='', verbose_name='执行结果')),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('update_time', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType', verbose_name='模型')),
+            ],
+            options={
+                'verbose_name': '后台任务',
+            },
+        ),
+    ]
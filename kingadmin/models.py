@@ -0,0 +1,78 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils import timezone
+
+
+class SearchToken(models.Model):
+    """
+    全文搜索 倒排索引
+    每条数据 list_search 中每个字段的内容拆分成词，一个词一行
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name="模型")
+    object_id = models.PositiveIntegerField(verbose_name="数据主键")
+    field = models.CharField(max_length=100, verbose_name="搜索字段")
+    token = models.CharField(max_length=20, verbose_name="词")
+
+    class Meta:
+        verbose_name = "搜索索引"
+        index_together = [
+            ("content_type", "token"),
+            ("content_type", "object_id"),
+        ]
+
+    def __str__(self):
+        return self.token
+
+
+class Job(models.Model):
+    """
+    后台任务 异步批量操作的状态、进度和结果
+    """
+    PENDING, RUNNING, SUCCESS, FAILED = "pending", "running", "success", "failed"
+    STATUS_CHOICES = (
+        (PENDING, "等待执行"),
+        (RUNNING, "执行中"),
+        (SUCCESS, "成功"),
+        (FAILED, "失败"),
+    )
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name="模型")
+    action = models.CharField(max_length=100, verbose_name="批量操作")
+    params = models.TextField(blank=True, default="", verbose_name="请求参数")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="状态")
+    progress = models.PositiveIntegerField(default=0, verbose_name="已处理条数")
+    total = models.PositiveIntegerField(default=0, verbose_name="总条数")
+    result = models.TextField(blank=True, default="", verbose_name="执行结果")
+    create_time = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    update_time = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "后台任务"
+
+    def __str__(self):
+        return f"{self.action}({self.get_status_display()})"
+
+    def set_progress(self, progress, total=None):
+        """
+        更新进度 在批量操作中调用
+        :param progress: 已处理条数
+        :param total: 总条数
+        """
+        self.progress = progress
+        values = {"progress": progress, "update_time": timezone.now()}
+        if total is not None:
+            self.total = values["total"] = total
+        Job.objects.filter(pk=self.pk).update(**values)
+
+    def to_dict(self):
+        return {
+            "id": self.pk,
+            "action": self.action,
+            "status": self.status,
+            "status_display": self.get_status_display(),
+            "progress": self.progress,
+            "total": self.total,
+            "result": self.result,
+            "create_time": self.create_time,
+            "update_time": self.update_time,
+        }
@@ -1,21 +1,54 @@
+import copy
+import csv
+import hashlib
+import json
+import threading
+import weakref
 from functools import wraps
+from itertools import count
 from inspect import getfullargspec
 
 from django.conf.urls import url
 from django.contrib.admin.sites import AlreadyRegistered
-from django.db.models import Q
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError
+from django.db import router, transaction, DatabaseError
+from django.db.models import Q, QuerySet, Count, prefetch_related_objects
 from django.forms.fields import DateTimeField, DateField, TimeField
 from django.shortcuts import render
-from django.http.response import JsonResponse
-from django.urls import reverse, NoReverseMatch
-from django.db.models import ForeignKey, ManyToManyField
+from django.http.response import JsonResponse, StreamingHttpResponse, FileResponse
+from django.template.loader import render_to_string
+from django.urls import reverse, get_script_prefix
+from django.db.models import ForeignKey, ManyToManyField, FileField as ModelFileField
 from django.utils.safestring import mark_safe
-from django.forms.models import modelform_factory
-from django.forms.fields import ImageField, FileField
+from django.forms.models import modelform_factory, ModelChoiceField, ModelMultipleChoiceField
+from django.forms.fields import ImageField, FileField, MultipleChoiceField
 
 from kingadmin.fields import Field
+from kingadmin.models import Job
 from kingadmin.settings import admin_settings
-from kingadmin.utils.paginator import Paginator
+from kingadmin.templatetags.table import table_thead, iter_tbody, render_cell, table_stream
+from kingadmin.utils.cache import get_model_version, bump_model_version, watch_model
+from kingadmin.utils.delete import get_fast_delete_relations, delete_in_chunks
+from kingadmin.utils.export import iter_chunks, iter_csv, write_xlsx
+from kingadmin.utils.importer import read_rows
+from kingadmin.utils.jobs import submit_job
+from kingadmin.utils.paginator import Paginator, KeysetPaginator, ExactCount
+from kingadmin.utils.query import get_related_lookups, get_only_fields, get_values_fields, \
+    get_lookup_condition, lookup_multi_valued
+from kingadmin.utils.render import get_render_plan
+from kingadmin.utils.search import DatabaseSearchBackend, IndexSearchBackend
+from kingadmin.utils.update import update_in_chunks, bulk_update_rows
+from kingadmin.utils.url import FilterLinkBuilder
+from kingadmin.widgets import AutocompleteSelect, AutocompleteSelectMultiple
+
+# 流式响应时 模板中表格位置的占位标记
+STREAM_MARKER = mark_safe("<!-- kingadmin:stream -->")
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# 生成url模板时 代替主键的占位值 需要匹配 url 中的 \d+
+URL_PK_PLACEHOLDER = 987654321
 
 
 class Option(object):
@@ -23,7 +56,7 @@ class Option(object):
     条件筛选类
     """
 
-    def __init__(self, field, condition="", is_multiple=False, text_func=None, value_func=None):
+    def __init__(self, field, condition="", is_multiple=False, text_func=None, value_func=None, limit=None):
         """
         初始化条件筛选
         :param field:筛选字段
@@ -31,9 +64,12 @@ class Option(object):
         :param is_multiple:条件筛选时 同一项 是否可以 多选 默认 False
         :param text_func:筛选字段网页显示内容
         :param value_func:筛选字段过滤
+        :param limit:本表普通字段 最多显示多少个不同的值 默认 FILTER_VALUES_LIMIT
         """
         self.field = field
         self.choices = False
+        self.flat = False
+        self.limit = limit
         self.text_func = text_func
         self.value_func = value_func
         self.is_multiple = is_multiple
@@ -44,16 +80,59 @@ class Option(object):
             q.children.append(Q(**filter))
         self.filter = q
 
-    def get_queryset(self, _field, model, params):
+    def get_data_list(self, _field, model):
+        """
+        获取条件筛选的所有数据
+        :param _field: 筛选字段对象
+        :param model: 当前url 操作哪个model
+        :return: 关联表数据 或 choices 或 本表字段去重后的值
+        """
         if isinstance(_field, ForeignKey) or isinstance(_field, ManyToManyField):
-            row = Row(_field.rel.model.objects.filter(self.filter), self, params, _field.verbose_name, model)
+            return list(_field.rel.model.objects.filter(self.filter))
+        elif _field.choices:
+            return list(_field.choices)
         else:
-            if _field.choices:
-                self.choices = True
-                row = Row(_field.choices, self, params, _field.verbose_name, model)
-            else:
-                row = Row(model.objects.filter(self.filter), self, params, _field.verbose_name, model)
-        return row
+            limit = self.limit or admin_settings.FILTER_VALUES_LIMIT
+            values = model.objects.filter(self.filter).exclude(**{f"{self.field}__isnull": True})
+            return list(values.order_by(self.field).values_list(self.field, flat=True).distinct()[:limit])
+
+    def get_counts(self, queryset):
+        """
+        一次分组查询 获取每个筛选值对应的数据条数
+        :param queryset: 当前搜索、其他筛选条件下的数据
+        :return: {筛选值: 条数}
+        """
+        rows = queryset.order_by().values(self.field).annotate(num=Count("pk", distinct=True))
+        return {str(row[self.field]): row["num"] for row in rows}
+
+    def get_queryset(self, _field, model, params, data_list=None, counts=None):
+        """
+        构建条件筛选一行数据
+        :param data_list: 条件筛选的所有数据 默认使用 get_data_list 查询
+        :param counts: 每个筛选值对应的数据条数 默认不显示
+        """
+        is_relation = isinstance(_field, ForeignKey) or isinstance(_field, ManyToManyField)
+        self.choices = not is_relation and bool(_field.choices)
+        self.flat = not is_relation and not _field.choices
+
+        if data_list is None:
+            data_list = self.get_data_list(_field, model)
+        return Row(data_list, self, params, _field.verbose_name, model, counts)
+
+    def get_accessors(self, model):
+        """
+        根据筛选数据的类型 一次确定取值和显示内容的方法，避免每个数据重复判断
+        :param model: 当前url 操作哪个model
+        :return: (取值方法, 显示内容方法)
+        """
+        if self.choices:
+            get_value, get_text = (lambda item: str(item[0])), (lambda item: item[1])
+        elif self.flat:
+            get_value, get_text = str, str
+        else:
+            get_value, get_text = (lambda item: self.get_value(item, model)), self.get_text
+
+        return self.value_func or get_value, self.text_func or get_text
 
     def get_text(self, item):
         """
@@ -66,6 +145,8 @@ class Option(object):
         else:
             if self.choices:
                 return item[1]
+            elif self.flat:
+                return str(item)
             else:
                 if hasattr(item, self.field):
                     return getattr(item, self.field)
@@ -79,11 +160,13 @@ class Option(object):
         :param model: 当前url 操作哪个model
         :return:
         """
-        if self.text_func:
+        if self.value_func:
             return self.value_func(item)
         else:
             if self.choices:
                 return str(item[0])
+            elif self.flat:
+                return str(item)
             else:
                 if isinstance(item, model):
                     if hasattr(item, self.field):
@@ -99,7 +182,7 @@ class Row(object):
     条件筛选每行数据统一格式
     """
 
-    def __init__(self, data_list, option, params, verbose_name, model):
+    def __init__(self, data_list, option, params, verbose_name, model, counts=None):
         """
         条件筛选类初始化
         :param data_list: 每行数据 queryset或choices
@@ -107,12 +190,22 @@ class Row(object):
         :param params: get请求参数
         :param verbose_name: 字段的verbose_name
         :param model: 当前url 操作哪个model
+        :param counts: 每个筛选值对应的数据条数 {筛选值: 条数}
         """
         self.data_list = data_list
         self.option = option
         self.params = params
         self.verbose_name = verbose_name
         self.model = model
+        self.counts = counts
+
+    def get_text(self, text, field_value):
+        """
+        筛选项显示内容 有条数时显示条数
+        """
+        if self.counts is None:
+            return text
+        return f'{text} <span class="layui-badge layui-bg-gray">{self.counts.get(str(field_value), 0)}</span>'
 
     def __iter__(self):
         """
@@ -122,75 +215,35 @@ class Row(object):
         is_multiple = "(可多选)" if self.option.is_multiple else ""
         yield mark_safe(f'<label class="layui-form-label">{self.verbose_name}{is_multiple}：</label>')
 
-        params_list = self.params.getlist(self.option.field, [])
-        query_dict = self.params.copy()
+        builder = FilterLinkBuilder(self.params, self.option.field)
 
-        if params_list:
-            query_dict.pop(self.option.field)
-            yield mark_safe(f'<a href="?{query_dict.urlencode()}" class="layui-btn layui-btn-primary">全部</a>')
+        if builder.selected:
+            yield mark_safe(f'<a href="{builder.all_link()}" class="layui-btn layui-btn-primary">全部</a>')
         else:
             yield mark_safe('<a href="javascript:void()" class="layui-btn">全部</a>')
 
-        query_dict = self.params.copy()
-        for data in self.data_list:
-            field_value = self.option.get_value(data, self.model)
-            params_list = self.params.getlist(self.option.field, [])
-
-            # 是否可以多选项过滤
-            if self.option.is_multiple:
-
-                if field_value in params_list:
-                    params_list.remove(field_value)
+        get_value, get_text = self.option.get_accessors(self.model)
+        get_link = builder.multiple_link if self.option.is_multiple else builder.single_link
+        selected = set(builder.selected)
 
-                    if params_list:
-                        query_dict.setlist(self.option.field, params_list)
-                    else:
-                        query_dict.pop(self.option.field)
-
-                    yield mark_safe(
-                        f'''<a 
-                               href="?{query_dict.urlencode()}" 
-                               class="layui-btn"
-                           >
-                               {self.option.get_text(data)}
-                           </a>''')
+        for data in self.data_list:
+            field_value = get_value(data)
+            btn_class = "layui-btn" if field_value in selected else "layui-btn layui-btn-primary"
 
-                else:
-                    params_list.append(field_value)
-                    query_dict.setlist(self.option.field, params_list)
-
-                    yield mark_safe(
-                        f'''<a 
-                               href="?{query_dict.urlencode()}" 
-                               class="layui-btn layui-btn-primary"
-                            >
-                               {self.option.get_text(data)}
-                            </a>''')
-            else:
-                query_dict[self.option.field] = field_value
-                if query_dict[self.option.field] in params_list:
-                    yield mark_safe(
-                        f'''<a 
-                                href="?{query_dict.urlencode()}" 
-                                class="layui-btn"
-                            >
-                                {self.option.get_text(data)}
-                            </a>''')
-                else:
-                    yield mark_safe(
-                        f'''<a 
-                                href="?{query_dict.urlencode()}" 
-                                class="layui-btn layui-btn-primary"
-                            >
-                                {self.option.get_text(data)}
-                            </a>''')
+            yield mark_safe(
+                f'''<a 
+                        href="{get_link(field_value)}" 
+                        class="{btn_class}"
+                    >
+                        {self.get_text(get_text(data), field_value)}
+                    </a>''')
 
 
 class ModelAdmin(object):
     list_display = []  # 列表展示字段
     list_order = []  # 结果排序 升序 字段名 降序 -字段名
     checkbox = False  # 是否启动第一列复选框
-    action_list = ["bulk_delete", ]  # 批量操作 需要checkbox=True 默认为批量删除
+    action_list = ["bulk_delete", "bulk_edit", "bulk_export"]  # 批量操作 需要checkbox=True 默认为批量删除、修改、导出
 
     """
     options = ["edit", "delete", "switch"]
@@ -206,31 +259,67 @@ class ModelAdmin(object):
     fields = "__all__"  # forms.ModelForm中Meta中的 fields
 
     options = []  # 操作列 可选值 edit delete 也可以自定义方法 默认 []
-    list_search = []  # 搜索字段
+    list_search = []  # 搜索字段 默认包含匹配 字段名前加 = 精确匹配 ^ 前缀匹配 # 数字相等
     list_filter = []  # 条件筛选字段 可以是字段字符串 或者 是 Option类
 
     extra_add = True  # 添加页面跨表添加开关
+    autocomplete_fields = None  # 使用自动补全的外键、多对多字段 默认 None 关联模型已注册并设置了 list_search 时使用
+    bulk_edit_fields = None  # 批量修改可以修改的字段 默认 None 使用modelForm中除多对多、唯一、文件外的字段
+
+    list_select_related = None  # 展示页 select_related 字段 默认 None 根据 list_display 自动分析
+    list_prefetch_related = None  # 展示页 prefetch_related 字段 可以是字段字符串或 Prefetch 对象 默认 None 自动分析
+    keyset_pagination = False  # 是否使用游标分页 根据 list_order + 主键 定位 适用于数据量大的表
+    count_strategy = ExactCount  # 分页计数策略 可选值 ExactCount CachedCount EstimatedCount
+    list_only = True  # 展示页是否只查询 list_display 用到的字段
+    list_values_mode = False  # 展示列全部是本表普通字段时 使用 values_list 查询 不实例化模型
+    list_streaming = False  # 展示页使用流式响应 先返回页面头部 再逐行返回表格数据 适用于每页数据很多的情况
+    list_filter_counts = True  # 条件筛选是否显示每项的数据条数
+    search_backend = DatabaseSearchBackend  # 搜索后端 可选值 DatabaseSearchBackend InvertedIndexSearchBackend SQLiteFTSSearchBackend
 
     def __init__(self, model, admin_site):
         self.model = model
         self.admin_site = admin_site
+        self._list_display_cache = {}
+        self._url_templates = {}
+        self._list_display_fields = None
+        self._list_display_lock = threading.Lock()
+        self._form_class = None
+        # modelForm类 -> 是否接收request参数、前端渲染信息 请求级别的表单类被回收时自动删除
+        self._form_accepts_request = weakref.WeakKeyDictionary()
+        self._form_metadata = weakref.WeakKeyDictionary()
+        self._autocomplete_admins = None
+
+        self._search_backend = self.search_backend()
+        self._search_backend.register(self)
+
+        # 数据变化时更新版本号 使条件筛选、计数缓存失效
+        watch_model(model)
+        for option in self.list_filter:
+            field = model._meta.get_field(option if isinstance(option, str) else option.field)
+            if field.is_relation:
+                watch_model(field.related_model)
 
     @property
     def list_display_fields(self):
         """
         对list_display（列表展示字段）进行处理
+        Field 是类属性 多个线程共享，复制一份再绑定，每个ModelAdmin只处理一次
         """
-        fields = []
-        for field in self.list_display:
-            field_obj = getattr(self, field, None)
-            if isinstance(field_obj, Field):
-                field_obj.bind(field, self)
-                fields.append(field_obj)
-            else:
-                fields.append(field)
-
-        # TODO 如果出现瓶颈, 可以考虑使用 cache, 避免出现重复计算
-        return fields
+        if self._list_display_fields is None:
+            with self._list_display_lock:
+                if self._list_display_fields is None:
+                    fields = []
+                    for field in self.list_display:
+                        field_obj = getattr(self, field, None)
+                        if isinstance(field_obj, Field):
+                            field_obj = copy.deepcopy(field_obj)
+                            field_obj.bind(field, self)
+                            fields.append(field_obj)
+                        else:
+                            fields.append(field)
+                    self._list_display_fields = tuple(fields)
+
+        return self._list_display_fields
 
     def get_checkbox(self, request) -> bool:
         """
@@ -262,20 +351,173 @@ class ModelAdmin(object):
         """
         return self.list_order
 
+    def get_list_display_cache(self, request, func, *args):
+        """
+        根据展示列分析查询方式 每种展示列组合只分析一次
+        :param func: 分析函数 func(model, list_display, *args)
+        :param args: 分析函数的其他参数 需要可哈希
+        """
+        list_display = self.get_list_display(request)
+        key = (func.__name__, tuple(column.field_name if isinstance(column, Field) else column
+                                    for column in list_display), args)
+        if key not in self._list_display_cache:
+            self._list_display_cache[key] = func(self.model, list_display, *args)
+
+        return self._list_display_cache[key]
+
+    def get_related_lookups(self, request) -> tuple:
+        """
+        根据展示列分析跨表查询
+        :return: (select_related列表, prefetch_related列表)
+        """
+        return self.get_list_display_cache(request, get_related_lookups)
+
+    def get_list_select_related(self, request) -> list:
+        """
+        用于子类继承，自定义展示页 select_related 字段
+        """
+        if self.list_select_related is not None:
+            return self.list_select_related
+        return self.get_related_lookups(request)[0]
+
+    def get_list_prefetch_related(self, request) -> list:
+        """
+        用于子类继承，自定义展示页 prefetch_related 字段，可以使用 Prefetch 对象
+        """
+        if self.list_prefetch_related is not None:
+            return self.list_prefetch_related
+        return self.get_related_lookups(request)[1]
+
+    def get_list_only_fields(self, request):
+        """
+        用于子类继承，展示页需要查询的字段 返回 None 表示查询所有字段
+        """
+        if not self.list_only:
+            return None
+
+        ordering = tuple(field for field in self.get_list_order(request) if isinstance(field, str))
+        ordering += tuple(field for field in self.get_list_select_related(request) if isinstance(field, str))
+        return self.get_list_display_cache(request, get_only_fields, ordering)
+
+    def get_list_values_fields(self, request):
+        """
+        用于子类继承，values模式下 values_list 查询的字段 返回 None 表示使用模型实例
+        """
+        if not self.list_values_mode:
+            return None
+        return self.get_list_display_cache(request, get_values_fields)
+
+    def get_list_renderers(self, request, values_mode=False) -> list:
+        """
+        展示列的渲染函数列表 每种展示列组合只编译一次 KING_ADMIN 配置变化时重新编译
+        :param values_mode: 是否values模式
+        """
+        return get_render_plan(self, self.get_list_display(request), values_mode)
+
     def get_model_form_class(self) -> object:
         """
-        用于子类继承，自定义modelForm
+        用于子类继承，自定义modelForm 每个ModelAdmin只调用一次，结果由 get_form_class 缓存
         :return:
         """
         if self.model_form_class:
-            kwonlyargs = getfullargspec(self.model_form_class.__init__).kwonlyargs
-            if "request" not in kwonlyargs:
+            if not self.form_accepts_request(self.model_form_class):
                 raise ValueError(f"{self.model_form_class.__name__}类__init__方法必须传递request关键字参数")
 
             return self.model_form_class
 
         return modelform_factory(self.model, fields=self.fields)
 
+    def get_form_class(self, request) -> object:
+        """
+        用于子类继承，根据不同请求使用不同的modelForm类 默认使用缓存的 get_model_form_class()
+        """
+        if self._form_class is None:
+            self._form_class = self.get_model_form_class()
+        return self._form_class
+
+    def form_accepts_request(self, form_class) -> bool:
+        """
+        modelForm类__init__方法是否接收request关键字参数 每个类只检查一次
+        """
+        accepts = self._form_accepts_request.get(form_class)
+        if accepts is None:
+            accepts = "request" in getfullargspec(form_class.__init__).kwonlyargs
+            self._form_accepts_request[form_class] = accepts
+        return accepts
+
+    def get_form(self, request, form_class=None, **kwargs):
+        """
+        实例化modelForm 接收request关键字参数时传递request
+        :param form_class: 默认 get_form_class(request)
+        :param kwargs: data instance 等表单参数
+        """
+        if form_class is None:
+            form_class = self.get_form_class(request)
+        if self.form_accepts_request(form_class):
+            kwargs["request"] = request
+        form = form_class(**kwargs)
+        self.set_autocomplete_widgets(request, form)
+        return form
+
+    def get_autocomplete_fields(self, request) -> dict:
+        """
+        用于子类继承，使用自动补全的外键、多对多字段
+        :return: {字段名: 关联模型的自动补全url}
+        """
+        if self._autocomplete_admins is None:
+            if self.autocomplete_fields is not None:
+                fields = [self.model._meta.get_field(name) for name in self.autocomplete_fields]
+            else:
+                fields = [field for field in self.model._meta.get_fields()
+                          if field.concrete and (field.many_to_one or field.one_to_one or field.many_to_many)]
+
+            admins = {}
+            for field in fields:
+                related_admin = self.admin_site._registry.get(field.related_model)
+                if related_admin is None:
+                    continue
+                if self.autocomplete_fields is None and not related_admin.list_search:
+                    continue
+                admins[field.name] = related_admin
+            self._autocomplete_admins = admins
+
+        # url 与部署前缀有关 只缓存关联的ModelAdmin
+        return {name: admin.get_url("autocomplete") for name, admin in self._autocomplete_admins.items()}
+
+    def set_autocomplete_widgets(self, request, form):
+        """
+        自动补全字段替换为只渲染已选中选项的下拉框 不再查询关联表的全部数据
+        """
+        for name, autocomplete_url in self.get_autocomplete_fields(request).items():
+            field = form.fields.get(name)
+            if not isinstance(field, ModelChoiceField):
+                continue
+
+            if isinstance(field, ModelMultipleChoiceField):
+                widget = AutocompleteSelectMultiple(autocomplete_url, attrs=field.widget.attrs)
+            else:
+                widget = AutocompleteSelect(autocomplete_url, attrs=field.widget.attrs)
+            widget.choices = field.choices
+            widget.is_required = field.required
+            field.widget = widget
+
+    def get_count_strategy(self, request):
+        """
+        用于子类继承，根据不同请求选择分页计数策略
+        """
+        return self.count_strategy()
+
+    def get_paginator(self, request, queryset):
+        """
+        用于子类继承，自定义分页类
+        """
+        if self.keyset_pagination:
+            # 排序字段不是数据库列时 使用页码分页
+            list_order = self.get_list_order(request)
+            if KeysetPaginator.resolve_ordering(queryset.model, list_order) is not None:
+                return KeysetPaginator(queryset, list_order, request.GET)
+        return Paginator(queryset, request.GET, self.get_count_strategy(request))
+
     def get_action_list(self, request) -> list:
         """
         用于子类继承，获取批量操作操作
@@ -309,15 +551,447 @@ class ModelAdmin(object):
 
     def bulk_delete(self, request):
         pk_list = request.POST.getlist("pk")
-        self.model.objects.filter(pk__in=pk_list).delete()
+        deleted = self.delete_queryset(request, self.model.objects.filter(pk__in=pk_list))
+        return f"已删除 {deleted} 条数据"
 
     bulk_delete.label = "批量删除"
 
+    def submit_background_action(self, request, action):
+        """
+        批量操作设置 background = True 时 放入后台线程池执行，立即返回任务编号
+        后台执行的批量操作接收 (request, job) 两个参数，可以调用 job.set_progress 更新进度
+        任务状态通过 AdminSite 的 jobs/{任务编号}/ 查询
+        :param action: 批量操作方法名
+        """
+        job = submit_job(self, request, action)
+        if request.is_ajax():
+            return JsonResponse({
+                "code": 200,
+                "msg": "任务已提交",
+                "job_id": job.pk,
+                "status_url": reverse("kingadmin:job_status", kwargs={"pk": job.pk}),
+            })
+        return f"任务已提交 任务编号 {job.pk}"
+
+    def delete_queryset(self, request, queryset) -> int:
+        """
+        按主键分块删除数据 每块 DELETE_CHUNK_SIZE 条一个事务
+        模型没有删除信号、级联删除时 直接执行 DELETE 语句 不加载数据
+        :return: 删除的条数
+        """
+        fast_relations = get_fast_delete_relations(self.model)
+        on_chunk = None
+        if fast_relations is not None:
+            def on_chunk(pks):
+                self.after_fast_delete(request, pks)
+
+        return delete_in_chunks(queryset, admin_settings.DELETE_CHUNK_SIZE, fast_relations, on_chunk)
+
+    def after_fast_delete(self, request, pks):
+        """
+        直接删除不发送 post_delete 信号，需要手动更新缓存版本号和搜索索引
+        :param pks: 删除的主键
+        """
+        bump_model_version(self.model)
+
+        if isinstance(self._search_backend, IndexSearchBackend):
+            self._search_backend.delete(self, pks)
+
+    def bulk_edit(self, request):
+        """
+        批量修改勾选的数据 返回修改页面，勾选要修改的字段后提交到 edit/
+        """
+        pk_list = request.POST.getlist("pk")
+        if not pk_list:
+            return "请勾选要修改的数据"
+
+        forms = self.get_bulk_edit_form(request)
+        context = self.get_form_context(request, forms, self.get_bulk_edit_fields(request))
+        return render(request, "kingadmin/form.html", {
+            **context,
+            "add_change_url": self.get_url("edit"),
+            "extra_add_fields": {},
+            "file_fields": [],
+            "bulk_edit": True,
+            "pks": ",".join(pk_list),
+            "success_url": request.get_full_path(),
+        })
+
+    bulk_edit.label = "批量修改"
+
+    def get_bulk_edit_fields(self, request) -> list:
+        """
+        用于子类继承，批量修改可以修改的字段
+        默认排除多对多(update不能修改)、唯一(修改成相同的值会冲突)、文件字段
+        """
+        if self.bulk_edit_fields is not None:
+            return list(self.bulk_edit_fields)
+
+        names = []
+        for name in self.get_form_class(request).base_fields:
+            try:
+                field = self.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.many_to_many and not field.unique \
+                    and not isinstance(field, ModelFileField):
+                names.append(name)
+        return names
+
+    def get_bulk_edit_form(self, request):
+        """
+        批量修改使用的表单 只用于渲染和校验字段，不保存
+        """
+        return self.get_form(request)
+
+    def clean_bulk_edit_values(self, form, data, names):
+        """
+        只校验要修改的字段
+        :param data: 提交的数据
+        :param names: 要修改的字段名
+        :return: (校验后的值 {字段名: 值}, 错误信息 {字段名: [错误]})
+        """
+        values, errors = {}, {}
+        for name in names:
+            field = form.fields[name]
+            value = field.widget.value_from_datadict(data, {}, form.add_prefix(name))
+            try:
+                values[name] = field.clean(value)
+            except ValidationError as e:
+                errors[name] = e.messages
+        return values, errors
+
+    def clean_bulk_edit_pks(self, pks) -> list:
+        """
+        转换主键类型 主键格式错误时抛出 ValidationError
+        """
+        pk_field = self.model._meta.pk
+        return [pk_field.to_python(pk) for pk in pks]
+
+    def edit_view(self, request):
+        """
+        批量修改数据
+        表单提交: pks 逗号分隔的主键，_edit_字段名 表示修改该字段，所有数据修改为相同的值 使用 update
+        json提交: {"rows": [{"pk": 主键, 字段名: 值}, ...]} 每行修改为不同的值 使用 CASE WHEN 分块 update
+        """
+        if request.method != "POST":
+            return JsonResponse({"code": 403, "msg": "请求方法不被允许"})
+
+        allowed = self.get_bulk_edit_fields(request)
+        form = self.get_bulk_edit_form(request)
+        chunk_size = admin_settings.UPDATE_CHUNK_SIZE
+
+        if request.content_type == "application/json":
+            try:
+                rows = json.loads(request.body.decode("utf-8"))["rows"]
+                pks = self.clean_bulk_edit_pks(row["pk"] for row in rows)
+            except (ValueError, KeyError, TypeError, ValidationError):
+                return JsonResponse({"code": 201, "msg": "数据格式错误"})
+
+            values, errors = {}, []
+            for number, (pk, row) in enumerate(zip(pks, rows), 1):
+                names = [name for name in row if name != "pk"]
+                row_errors = {name: ["该字段不允许批量修改"] for name in names if name not in allowed}
+                if not row_errors:
+                    values[pk], row_errors = self.clean_bulk_edit_values(form, row, names)
+                if row_errors:
+                    errors.append({"row": number, "errors": row_errors})
+
+            if errors:
+                return JsonResponse({"code": 201, "msg": "修改失败", "errors": errors})
+
+            pks = list(values)
+            updated = bulk_update_rows(self.model, values, chunk_size)
+
+        else:
+            try:
+                pks = self.clean_bulk_edit_pks(pk for pk in request.POST.get("pks", "").split(",") if pk)
+            except ValidationError:
+                return JsonResponse({"code": 201, "msg": "数据格式错误"})
+
+            names = [name for name in allowed if request.POST.get(f"_edit_{name}")]
+            if not pks or not names:
+                return JsonResponse({"code": 201, "msg": "请选择要修改的字段"})
+
+            values, errors = self.clean_bulk_edit_values(form, request.POST, names)
+            if errors:
+                return JsonResponse({"code": 201, "msg": "修改失败", "errors": errors})
+
+            updated = update_in_chunks(self.model, pks, values, chunk_size)
+
+        self.after_bulk_update(request, pks)
+        return JsonResponse({"code": 200, "msg": f"已修改 {updated} 条数据", "updated": updated})
+
+    def after_bulk_update(self, request, pks):
+        """
+        update 不发送 post_save 信号，需要手动更新缓存版本号和搜索索引
+        :param pks: 修改的主键
+        """
+        bump_model_version(self.model)
+
+        if isinstance(self._search_backend, IndexSearchBackend):
+            self._search_backend.index(self, pks)
+
+    def bulk_export(self, request):
+        """
+        导出当前搜索、筛选后的数据 勾选了数据时只导出勾选的数据
+        """
+        queryset = self.get_changelist_queryset(request)
+        pk_list = request.POST.getlist("pk")
+        if pk_list:
+            queryset = queryset.filter(pk__in=pk_list)
+
+        export_param = admin_settings.EXPORT_FORMAT_PARAM
+        export_format = request.POST.get(export_param) or request.GET.get(export_param, "csv")
+        return self.get_export_response(request, queryset, export_format)
+
+    bulk_export.label = "导出"
+
+    def export_view(self, request):
+        """
+        导出数据 参数与展示页相同
+        """
+        queryset = self.get_changelist_queryset(request)
+        export_format = request.GET.get(admin_settings.EXPORT_FORMAT_PARAM, "csv")
+        return self.get_export_response(request, queryset, export_format)
+
+    def get_export_headers(self, request) -> list:
+        """
+        导出数据的表头
+        """
+        return table_thead({
+            "has_checkbox": False,
+            "list_display": self.get_list_display(request),
+            "model": self.model,
+            "options": [],
+        })
+
+    def get_export_rows(self, request, queryset):
+        """
+        逐块读取导出数据 每行为各展示列的纯文本
+        """
+        list_display = self.get_list_display(request)
+        chunk_size = admin_settings.EXPORT_CHUNK_SIZE
+
+        if not list_display:
+            for chunk in iter_chunks(queryset, chunk_size):
+                for instance in chunk:
+                    yield [str(instance)]
+            return
+
+        values_fields = self.get_list_values_fields(request)
+        if values_fields:
+            renderers = get_render_plan(self, list_display, values_mode=True, plain=True)
+            for values in queryset.values_list(*values_fields).iterator():
+                yield [renderer(value) for renderer, value in zip(renderers, values)]
+            return
+
+        renderers = get_render_plan(self, list_display, plain=True)
+        for chunk in iter_chunks(queryset, chunk_size, self.get_list_prefetch_related(request)):
+            for instance in chunk:
+                yield [renderer(instance) for renderer in renderers]
+
+    def get_export_response(self, request, queryset, export_format="csv"):
+        """
+        导出响应 csv 边查询边返回，xlsx 写入临时文件后返回 需要安装 openpyxl
+        :param export_format: 导出格式 csv xlsx
+        """
+        headers = self.get_export_headers(request)
+        rows = self.get_export_rows(request, queryset)
+
+        if export_format == "xlsx":
+            try:
+                file = write_xlsx(headers, rows)
+            except ImportError as e:
+                return JsonResponse({"code": 201, "msg": f"导出失败 {e}"})
+            response = FileResponse(file, content_type=XLSX_CONTENT_TYPE)
+        else:
+            export_format = "csv"
+            response = StreamingHttpResponse(iter_csv(headers, rows), content_type="text/csv; charset=utf-8")
+
+        response["Content-Disposition"] = f'attachment; filename="{self.model._meta.model_name}.{export_format}"'
+        return response
+
+    def import_view(self, request):
+        """
+        批量导入数据 上传 csv 或 json 文件
+        csv 第一行为表头 表头可以是字段名或字段的中文名，多对多字段的多个值用逗号分隔
+        json 为对象列表 [{字段名: 值}, ...]
+        """
+        if request.method != "POST":
+            return JsonResponse({"code": 403, "msg": "请求方法不被允许"})
+
+        file = request.FILES.get("file")
+        if file is None:
+            return JsonResponse({"code": 201, "msg": "请上传文件"})
+
+        try:
+            rows = read_rows(file)
+        except ValueError as e:
+            return JsonResponse({"code": 201, "msg": f"文件格式错误 {e}", "created": 0, "errors": []})
+
+        errors = []
+        created, stopped_row = self.import_rows(request, rows, errors)
+        if stopped_row is not None:
+            return JsonResponse({
+                "code": 201,
+                "msg": f"文件第 {stopped_row} 行读取失败，之前的数据已导入",
+                "created": created,
+                "stopped_row": stopped_row,
+                "errors": errors,
+            })
+
+        if errors:
+            return JsonResponse({"code": 201, "msg": "部分数据导入失败", "created": created, "errors": errors})
+        return JsonResponse({"code": 200, "msg": "导入成功", "created": created, "errors": errors})
+
+    def get_import_field_names(self, form_class) -> dict:
+        """
+        导入文件表头 与 表单字段名 的对应关系，表头可以是字段名或字段的中文名
+        :return: {表头: 字段名}
+        """
+        field_names = {}
+        for name, field in form_class.base_fields.items():
+            field_names[name] = name
+            if field.label:
+                field_names[str(field.label)] = name
+            try:
+                field_names[str(self.model._meta.get_field(name).verbose_name)] = name
+            except FieldDoesNotExist:
+                pass
+        return field_names
+
+    def get_import_data(self, form_class, field_names, row) -> dict:
+        """
+        将导入文件的一行数据 转换成表单数据
+        """
+        data = {}
+        for key, value in row.items():
+            name = field_names.get(str(key).strip())
+            if name is None:
+                continue
+
+            field = form_class.base_fields[name]
+            if isinstance(field, (MultipleChoiceField, ModelMultipleChoiceField)) and isinstance(value, str):
+                # csv中多个值用逗号分隔
+                value = [item.strip() for item in value.split(",") if item.strip()]
+            data[name] = value
+        return data
+
+    def import_rows(self, request, rows, errors) -> tuple:
+        """
+        分批校验、写入导入数据
+        文件读取出错(编码错误、csv格式错误)时停止读取，已读取的数据仍会导入，之前的批次已经提交
+        :param rows: 每行数据的字典
+        :param errors: 错误列表 校验或写入失败、读取失败的行会添加到该列表 {"row": 行号, "errors": 错误信息}
+        :return: (成功导入的条数, 读取失败的行号 读取完成时为 None)
+        """
+        form_class = self.get_form_class(request)
+        field_names = self.get_import_field_names(form_class)
+        batch_size = admin_settings.IMPORT_BATCH_SIZE
+
+        created, batch, stopped_row = 0, [], None
+        rows = iter(rows)
+        for number in count(1):
+            try:
+                row = next(rows)
+            except StopIteration:
+                break
+            except (ValueError, csv.Error) as e:
+                stopped_row = number
+                errors.append({"row": number, "errors": {"__all__": [f"文件格式错误 {e}"]}})
+                break
+
+            batch.append((number, self.get_import_data(form_class, field_names, row)))
+            if len(batch) >= batch_size:
+                created += self.import_batch(request, form_class, batch, errors)
+                batch = []
+
+        if batch:
+            created += self.import_batch(request, form_class, batch, errors)
+
+        return created, stopped_row
+
+    def import_batch(self, request, form_class, batch, errors) -> int:
+        """
+        校验一批数据 校验通过的数据在一个事务中使用 bulk_create 写入
+        有多对多数据的行需要先保存再设置多对多关系 单独保存
+        写入失败时 逐条写入找出出错的行
+        :param batch: [(行号, 表单数据)]
+        :return: 成功导入的条数
+        """
+        m2m_names = [field.name for field in self.model._meta.many_to_many if field.name in form_class.base_fields]
+
+        forms = []
+        for number, data in batch:
+            form = self.get_form(request, form_class, data=data)
+
+            if form.is_valid():
+                forms.append((number, form))
+            else:
+                errors.append({"row": number, "errors": form.errors})
+
+        if not forms:
+            return 0
+
+        bulk_forms, m2m_forms = [], []
+        for number, form in forms:
+            if any(form.cleaned_data.get(name) for name in m2m_names):
+                m2m_forms.append(form)
+            else:
+                bulk_forms.append(form)
+
+        using = router.db_for_write(self.model)
+        try:
+            with transaction.atomic(using=using):
+                self.model.objects.bulk_create([form.save(commit=False) for form in bulk_forms])
+                for form in m2m_forms:
+                    form.save()
+            instances = [form.instance for number, form in forms]
+        except DatabaseError:
+            instances = []
+            for number, form in forms:
+                if form.instance._meta.auto_field is not None:
+                    # 批量写入失败回滚后 清除可能已分配的主键
+                    form.instance.pk = None
+                try:
+                    with transaction.atomic(using=using):
+                        form.save()
+                    instances.append(form.instance)
+                except DatabaseError as e:
+                    errors.append({"row": number, "errors": {"__all__": [str(e)]}})
+
+        self.after_import(request, instances)
+        return len(instances)
+
+    def after_import(self, request, instances):
+        """
+        导入数据写入后调用 bulk_create 不发送 post_save 信号，需要手动更新缓存版本号和搜索索引
+        :param instances: 写入成功的数据
+        """
+        if not instances:
+            return
+
+        bump_model_version(self.model)
+
+        if isinstance(self._search_backend, IndexSearchBackend):
+            pks = [instance.pk for instance in instances]
+            if all(pk is not None for pk in pks):
+                self._search_backend.index(self, pks)
+            else:
+                # 部分数据库 bulk_create 不返回主键
+                self._search_backend.rebuild(self)
+
     def get_urls(self):
         info = self.model._meta.app_label, self.model._meta.model_name
 
         urlpatterns = [
             url("^$", self.wrapper(self.changelist_view), name="%s_%s_changelist" % info),
+            url("^data/$", self.wrapper(self.data_view), name="%s_%s_data" % info),
+            url("^export/$", self.wrapper(self.export_view), name="%s_%s_export" % info),
+            url("^import/$", self.wrapper(self.import_view), name="%s_%s_import" % info),
+            url("^edit/$", self.wrapper(self.edit_view), name="%s_%s_edit" % info),
+            url("^autocomplete/$", self.wrapper(self.autocomplete_view), name="%s_%s_autocomplete" % info),
             url("^add/$", self.wrapper(self.add_view), name="%s_%s_add" % info),
             url("^delete/(?P<pk>\d+)$", self.wrapper(self.delete_view), name="%s_%s_delete" % info),
             url("^change/(?P<pk>\d+)$", self.wrapper(self.change_view), name="%s_%s_change" % info)
@@ -332,6 +1006,34 @@ class ModelAdmin(object):
     def extra_url(self) -> list:
         pass
 
+    def get_url_template(self, name) -> tuple:
+        """
+        获取url模板 (主键前的部分, 主键后的部分)
+        每个url只在第一次使用时 reverse 一次，之后通过拼接主键生成url
+        :param name: url名称 changelist add delete change
+        """
+        # 不同部署前缀(SCRIPT_NAME)下 url不同
+        key = (name, get_script_prefix())
+        template = self._url_templates.get(key)
+        if template is None:
+            url_name = "kingadmin:%s_%s_%s" % (self.model._meta.app_label, self.model._meta.model_name, name)
+            if name in ("delete", "change"):
+                placeholder = str(URL_PK_PLACEHOLDER)
+                template = tuple(reverse(url_name, kwargs={"pk": placeholder}).rsplit(placeholder, 1))
+            else:
+                template = (reverse(url_name), "")
+            self._url_templates[key] = template
+        return template
+
+    def get_url(self, name, pk="") -> str:
+        """
+        获取本模型的url 不调用 reverse
+        :param name: url名称 changelist add delete change
+        :param pk: 数据主键 delete change 需要
+        """
+        prefix, suffix = self.get_url_template(name)
+        return f"{prefix}{pk}{suffix}"
+
     @property
     def urls(self):
         return self.get_urls(), None, None
@@ -339,41 +1041,108 @@ class ModelAdmin(object):
     def get_list_filter_conditions(self, request):
         """
         获取过滤条件筛选的 条件
-        :return:
+        多对多、反向关联字段使用子查询 避免关联查询导致数据重复
+        :return: Q对象
         """
-        comb_condition = {}
+        comb_condition = Q()
         for option in self.get_list_filter(request):
-            condition = request.GET.getlist(option.field)
-            if condition:
-                comb_condition[f"{option.field}__in"] = condition
+            comb_condition &= self.get_list_filter_condition(request, option)
 
         return comb_condition
 
+    def get_list_filter_condition(self, request, option):
+        """
+        获取一个条件筛选的 条件
+        :return: Q对象
+        """
+        condition = request.GET.getlist(option.field)
+        if condition:
+            return get_lookup_condition(self.model, f"{option.field}__in", condition)
+        return Q()
+
     def get_search_queryset(self, request, queryset):
         """
         查询关键字的 queryset
         """
         keyword = request.GET.get(admin_settings.SEARCH_PARAM, "")
         if keyword:
-            query = Q()
-            query.connector = "OR"
-            for filter in self.get_list_search():
-                query.children.append((filter + "__contains", keyword))
-            queryset = queryset.filter(query)
+            queryset = self.get_search_backend(request).search(self, request, queryset, keyword)
 
         return queryset
 
+    def get_list_distinct(self, request) -> bool:
+        """
+        是否需要 distinct 去重，过滤和搜索已使用子查询，只有排序字段经过多对多、反向关联时才需要
+        """
+        return any(
+            lookup_multi_valued(self.model, field)
+            for field in self.get_list_order(request) if isinstance(field, str)
+        )
+
+    def get_search_backend(self, request):
+        """
+        用于子类继承，获取搜索后端
+        """
+        return self._search_backend
+
     def get_list_filter_rows(self, request):
         """
         获取条件筛选的 数据
+        每个筛选项的数据和条数 按当前搜索、其他筛选条件缓存，相关模型数据变化后失效
         """
+        list_filter = self.get_list_filter(request)
+        queryset = self.get_search_queryset(request, self.queryset_filter(request))
+        conditions = [self.get_list_filter_condition(request, option) for option in list_filter]
+
         list_filter_rows = []
-        for option in self.get_list_filter(request):
+        for index, option in enumerate(list_filter):
             _field = self.model._meta.get_field(option.field)
-            row = option.get_queryset(_field, self.model, request.GET)
-            list_filter_rows.append(row)
+
+            # 条数不考虑本筛选项自身的条件
+            option_queryset = queryset
+            for other_index, condition in enumerate(conditions):
+                if other_index != index:
+                    option_queryset = option_queryset.filter(condition)
+
+            data_list, counts = self.get_list_filter_data(request, option, _field, option_queryset)
+            list_filter_rows.append(option.get_queryset(_field, self.model, request.GET, data_list, counts))
         return list_filter_rows
 
+    def get_list_filter_data(self, request, option, _field, queryset):
+        """
+        获取一个条件筛选的数据和条数 使用缓存
+        :param queryset: 当前搜索、其他筛选条件下的数据
+        :return: (筛选数据, {筛选值: 条数} 或 None)
+        """
+        models = [self.model]
+        if _field.is_relation:
+            models.append(_field.related_model)
+        prefix = f"kingadmin:filter:{self.model._meta.label_lower}:{get_model_version(*models)}"
+
+        # 筛选数据 只与筛选项有关
+        key = f"{prefix}:{hashlib.md5(f'{option.field}:{option.filter}'.encode()).hexdigest()}"
+        data_list = cache.get(key)
+        if data_list is None:
+            data_list = option.get_data_list(_field, self.model)
+            cache.set(key, data_list, admin_settings.FILTER_CACHE_TIMEOUT)
+
+        if not self.list_filter_counts:
+            return data_list, None
+
+        # 条数 与当前搜索、其他筛选条件有关
+        try:
+            sql = str(queryset.order_by().query)
+        except EmptyResultSet:
+            return data_list, {}
+
+        key = f"{prefix}:{hashlib.md5(f'{option.field}:{sql}'.encode()).hexdigest()}"
+        counts = cache.get(key)
+        if counts is None:
+            counts = option.get_counts(queryset)
+            cache.set(key, counts, admin_settings.FILTER_CACHE_TIMEOUT)
+
+        return data_list, counts
+
     def queryset_filter(self, request):
         """
         用于子类继承，实现数据展示的过滤
@@ -381,22 +1150,10 @@ class ModelAdmin(object):
         """
         return self.model.objects.all()
 
-    def changelist_view(self, request):
+    def get_changelist_queryset(self, request):
         """
-        列表展示页面
+        展示页查询 搜索、排序、条件筛选、去重、跨表、只查询展示字段，展示页和json数据接口共用
         """
-        info = self.model._meta.app_label, self.model._meta.model_name
-
-        if request.method == "POST":
-            # 进行批量处理
-            bulk = request.POST.get("bulk")
-
-            if bulk:
-                if hasattr(self, bulk):
-                    res = getattr(self, bulk)(request)
-                    if res:
-                        return res
-
         queryset = self.queryset_filter(request)
 
         # 搜索关键字
@@ -407,64 +1164,261 @@ class ModelAdmin(object):
 
         # 条件筛选
         comb_condition = self.get_list_filter_conditions(request)
-        queryset = queryset.filter(**comb_condition).distinct()
+        queryset = queryset.filter(comb_condition)
+
+        # 去重
+        if self.get_list_distinct(request):
+            queryset = queryset.distinct()
+
+        # 跨表字段 一次查询
+        select_related = self.get_list_select_related(request)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+
+        # 只查询展示用到的字段
+        only_fields = self.get_list_only_fields(request)
+        if only_fields:
+            queryset = queryset.only(*only_fields)
+
+        return queryset
+
+    def get_changelist_page(self, request, queryset):
+        """
+        处理当前页数据 values模式、预加载多对多和反向关联
+        :param queryset: 分页后的当前页数据
+        :return: (当前页数据, 是否values模式)
+        """
+        # values模式 当前页数据不实例化模型 每行为 (主键, 展示列...)
+        values_fields = self.get_list_values_fields(request)
+        if values_fields and isinstance(queryset, QuerySet):
+            queryset = queryset.values_list(self.model._meta.pk.name, *values_fields)
+        else:
+            values_fields = None
+
+        # 多对多、反向关联字段 只对当前页数据预加载
+        prefetch_related = self.get_list_prefetch_related(request)
+        if prefetch_related and not values_fields:
+            queryset = list(queryset)
+            prefetch_related_objects(queryset, *prefetch_related)
+
+        return queryset, bool(values_fields)
+
+    def get_table_data(self, request, queryset, values_mode=False) -> dict:
+        """
+        构建表格需要的信息
+        :param queryset: 当前页数据
+        :param values_mode: 是否values模式
+        """
+        return {
+            "queryset": queryset,
+            "list_display": self.get_list_display(request),
+            "has_checkbox": self.get_checkbox(request),
+            "options": self.get_options(request),
+            "model": self.model,
+            "admin_class": self,
+            "values_mode": values_mode,
+            "renderers": self.get_list_renderers(request, values_mode),
+        }
+
+    def get_data_columns(self, request) -> list:
+        """
+        json数据接口的列 {"name": 列名, "label": 表头}
+        列名为字段名 Field实例为其字段名，没有展示列时为 __str__
+        """
+        list_display = self.get_list_display(request)
+        if not list_display:
+            return [{"name": "__str__", "label": self.model._meta.model_name}]
+
+        labels = self.get_export_headers(request)
+        return [
+            {"name": column.field_name if isinstance(column, Field) else column, "label": str(label)}
+            for column, label in zip(list_display, labels)
+        ]
+
+    def get_data_rows(self, request, page) -> list:
+        """
+        json数据接口每行数据 {"pk": 主键, 列名: 值}
+        本表字段返回原始值(外键为关联数据主键，多对多为主键列表)，Field实例列返回纯文本
+        展示列都是本表非多对多字段时 使用 values_list 查询 不实例化模型
+        :param page: 分页后的当前页数据
+        """
+        list_display = self.get_list_display(request)
+        opts = self.model._meta
+        if not list_display:
+            return [{"pk": instance.pk, "__str__": str(instance)} for instance in page]
+
+        names, fields = [], []
+        for column in list_display:
+            if isinstance(column, Field):
+                names.append(column.field_name)
+                fields.append(column)
+            else:
+                names.append(column)
+                fields.append(opts.get_field(column))
+
+        if isinstance(page, QuerySet) and all(
+                not isinstance(field, Field) and not field.many_to_many for field in fields):
+            values = page.values_list("pk", *[field.attname for field in fields])
+            return [dict(zip(["pk"] + names, row)) for row in values]
+
+        page = list(page)
+        prefetch_related = self.get_list_prefetch_related(request)
+        if prefetch_related:
+            prefetch_related_objects(page, *prefetch_related)
+
+        renderers = get_render_plan(self, list_display, plain=True)
+        rows = []
+        for instance in page:
+            row = {"pk": instance.pk}
+            for name, field, renderer in zip(names, fields, renderers):
+                if isinstance(field, Field):
+                    row[name] = renderer(instance)
+                elif field.many_to_many:
+                    row[name] = [item.pk for item in getattr(instance, name).all()]
+                else:
+                    row[name] = field.get_prep_value(getattr(instance, field.attname))
+            rows.append(row)
+        return rows
+
+    def data_view(self, request):
+        """
+        展示页json数据接口 与展示页使用相同的查询，返回当前页数据和分页信息
+        默认每行为字段原始值，参数 DATA_RENDER_PARAM=1 时返回表格各单元格的html
+        """
+        queryset = self.get_changelist_queryset(request)
+        paginator = self.get_paginator(request, queryset)
+
+        if request.GET.get(admin_settings.DATA_RENDER_PARAM) == "1":
+            queryset, values_mode = self.get_changelist_page(request, paginator.get_page())
+            table_data = self.get_table_data(request, queryset, values_mode)
+            return JsonResponse({
+                "code": 200,
+                "msg": "",
+                "headers": [str(header) for header in table_thead(table_data)],
+                "rows": [[render_cell(data) for data in row] for row in iter_tbody(table_data)],
+                "page": paginator.get_page_info(),
+            })
+
+        return JsonResponse({
+            "code": 200,
+            "msg": "",
+            "columns": self.get_data_columns(request),
+            "rows": self.get_data_rows(request, paginator.get_page()),
+            "page": paginator.get_page_info(),
+        })
+
+    def autocomplete_view(self, request):
+        """
+        外键、多对多字段的自动补全 按 list_search 搜索，每页 AUTOCOMPLETE_PAGE_SIZE 条
+        参数与展示页相同 search 搜索关键字 page 页码
+        不查询总数 多查一条判断是否有下一页
+        """
+        queryset = self.get_search_queryset(request, self.queryset_filter(request))
+        queryset = queryset.order_by(*self.get_list_order(request), "pk")
+        if self.get_list_distinct(request):
+            queryset = queryset.distinct()
+
+        page_size = admin_settings.AUTOCOMPLETE_PAGE_SIZE
+        try:
+            page = max(int(request.GET.get(admin_settings.PAGE_QUERY, 1)), 1)
+        except ValueError:
+            page = 1
+
+        start = (page - 1) * page_size
+        objs = list(queryset[start:start + page_size + 1])
+        return JsonResponse({
+            "code": 200,
+            "msg": "",
+            "data": [{"name": str(obj), "value": obj.pk} for obj in objs[:page_size]],
+            "page": page,
+            "has_more": len(objs) > page_size,
+        })
+
+    def changelist_view(self, request):
+        """
+        列表展示页面
+        """
+        message = ""
+        if request.method == "POST":
+            # 进行批量处理 返回字符串时作为提示信息显示
+            bulk = request.POST.get("bulk")
+
+            if bulk:
+                if hasattr(self, bulk):
+                    action = getattr(self, bulk)
+                    if getattr(action, "background", False):
+                        res = self.submit_background_action(request, bulk)
+                    else:
+                        res = action(request)
+                    if isinstance(res, str):
+                        message = res
+                    elif res:
+                        return res
+
+        queryset = self.get_changelist_queryset(request)
 
         # 分页
-        paginator = Paginator(queryset, request.GET)
+        paginator = self.get_paginator(request, queryset)
         page_html, queryset = paginator.get_html()
 
+        queryset, values_mode = self.get_changelist_page(request, queryset)
+
         # 获取url搜索参数
         search_param = admin_settings.SEARCH_PARAM
 
         data = {
-            "table_data": {
-                "queryset": queryset,
-                "list_display": self.get_list_display(request),
-                "has_checkbox": self.get_checkbox(request),
-                "options": self.get_options(request),
-                "model": self.model,
-                "admin_class": self,
-            },
+            "table_data": self.get_table_data(request, queryset, values_mode),
             "has_checkbox": self.get_checkbox(request),
             "has_add_button": self.get_add_button(request),
-            "add_url": reverse("kingadmin:%s_%s_add" % info),
+            "add_url": self.get_url("add"),
             "action_list": self.get_action_list(request),
             "list_filter": self.get_list_search(request),
             "keyword": request.GET.get(search_param, ""),
             "page_html": page_html,
             "list_filter_rows": self.get_list_filter_rows(request),
             "search_param": search_param,
+            "message": message,
         }
 
+        if self.get_list_streaming(request):
+            return self.get_streaming_response(request, "kingadmin/changelist.html", data)
+
         return render(request, "kingadmin/changelist.html", data)
 
+    def get_list_streaming(self, request) -> bool:
+        """
+        用于子类继承，展示页是否使用流式响应
+        """
+        return self.list_streaming
+
+    def get_streaming_response(self, request, template_name, context):
+        """
+        流式响应 先返回页面头部、条件筛选等，再逐行返回表格数据，最后返回页面剩余部分
+        """
+        context["stream_marker"] = STREAM_MARKER
+        head, tail = render_to_string(template_name, context, request).split(STREAM_MARKER, 1)
+
+        def stream():
+            yield head
+            yield from table_stream(context["table_data"])
+            yield tail
+
+        return StreamingHttpResponse(stream())
+
     def add_view(self, request):
         """
         添加数据页面
         """
         if request.method == "GET":
-            AddModelForm = self.get_model_form_class()
-            if self.model_form_class:
-                forms = AddModelForm(request=request)
-            else:
-                forms = AddModelForm()
+            forms = self.get_form(request)
 
-            info = self.model._meta.app_label, self.model._meta.model_name
-            add_url = reverse("kingadmin:%s_%s_add" % info)
             return render(request, "kingadmin/form.html", {
-                "fields": forms,
-                "add_change_url": add_url,
-                "datetime_fields": self.datetime_fields(forms),
-                "extra_add_fields": self.extra_add_fields(forms),
-                "file_fields": self.file_fields(forms)
+                **self.get_form_context(request, forms),
+                "add_change_url": self.get_url("add"),
             })
 
         elif request.method == "POST":
-            AddModelForm = self.get_model_form_class()
-            if self.model_form_class:
-                forms = AddModelForm(request.POST, request=request)
-            else:
-                forms = AddModelForm(request.POST)
+            forms = self.get_form(request, data=request.POST)
 
             if forms.is_valid():
                 forms.save()
@@ -478,10 +1432,9 @@ class ModelAdmin(object):
         """
         删除单条数据
         """
-        obj = self.model.objects.filter(pk=pk)
-        result = obj.delete()
-        if result:
-            return JsonResponse({"code": 200, "msg": "删除成功"})
+        deleted = self.delete_queryset(request, self.model.objects.filter(pk=pk))
+        if deleted:
+            return JsonResponse({"code": 200, "msg": "删除成功", "deleted": deleted})
         else:
             return JsonResponse({"code": 401, "msg": "删除失败"})
 
@@ -492,20 +1445,11 @@ class ModelAdmin(object):
         if request.method == "GET":
             obj = self.model.objects.filter(pk=pk).first()
             if obj:
-                ChangeModelForm = self.get_model_form_class()
-                if self.model_form_class:
-                    forms = ChangeModelForm(instance=obj, request=request)
-                else:
-                    forms = ChangeModelForm(instance=obj)
+                forms = self.get_form(request, instance=obj)
 
-                info = self.model._meta.app_label, self.model._meta.model_name
-                change_url = reverse("kingadmin:%s_%s_change" % info, kwargs={"pk": pk})
                 return render(request, "kingadmin/form.html", {
-                    "fields": forms,
-                    "add_change_url": change_url,
-                    "datetime_fields": self.datetime_fields(forms),
-                    "extra_add_fields": self.extra_add_fields(forms),
-                    "file_fields": self.file_fields(forms)
+                    **self.get_form_context(request, forms),
+                    "add_change_url": self.get_url("change", pk),
                 })
 
             else:
@@ -514,11 +1458,7 @@ class ModelAdmin(object):
         elif request.method == "POST":
             obj = self.model.objects.filter(pk=pk).first()
             if obj:
-                ChangeModelForm = self.get_model_form_class()
-                if self.model_form_class:
-                    forms = ChangeModelForm(data=request.POST, instance=obj, request=request)
-                else:
-                    forms = ChangeModelForm(data=request.POST, instance=obj)
+                forms = self.get_form(request, data=request.POST, instance=obj)
 
                 if forms.is_valid():
                     forms.save()
@@ -529,55 +1469,107 @@ class ModelAdmin(object):
         else:
             return JsonResponse({"code": 403, "msg": "请求方法不被允许"})
 
-    def datetime_fields(self, forms) -> list:
+    def get_form_context(self, request, forms, names=None) -> dict:
         """
-        选出哪些字段是 日期时间类型 用于前端渲染
+        表单页面的渲染数据 按字段名取出缓存的字段信息
         :param forms: 实例化form对象
-        :return:
+        :param names: 要渲染的字段名 默认全部字段
+        """
+        if names is None:
+            names = list(forms.fields)
+        metadata = self.get_form_metadata(forms)
+
+        datetime_fields = metadata["datetime_fields"]
+        file_fields = metadata["file_fields"]
+        add_admins = metadata["extra_add_admins"]
+        return {
+            "fields": [forms[name] for name in names],
+            "datetime_fields": [datetime_fields[name] for name in names if name in datetime_fields],
+            "file_fields": [file_fields[name] for name in names if name in file_fields],
+            # url 与部署前缀有关 只缓存关联的ModelAdmin
+            "extra_add_fields": {name: add_admins[name].get_url("add") for name in names if name in add_admins},
+        }
+
+    def get_form_metadata(self, forms) -> dict:
+        """
+        表单字段的前端渲染信息 由实例化的form计算，元素id与 prefix auto_id 一致
+        字段与modelForm类的 base_fields 相同时(没有在 __init__ 中增删、替换字段) 每个类、prefix、auto_id 只计算一次
         """
-        results = []
+        form_class = type(forms)
+        key = (forms.prefix, forms.auto_id)
+        base_fields = form_class.base_fields
+        cacheable = list(forms.fields) == list(base_fields) and all(
+            type(field) is type(base_fields[name])
+            and field.widget.attrs.get("id") == base_fields[name].widget.attrs.get("id")
+            for name, field in forms.fields.items()
+        )
+
+        if cacheable:
+            metadata = self._form_metadata.get(form_class, {}).get(key)
+            if metadata is not None:
+                return metadata
+
+        bound_fields = [forms[name] for name in forms.fields]
+        metadata = {
+            "datetime_fields": self.datetime_fields(bound_fields),
+            "file_fields": self.file_fields(bound_fields),
+            "extra_add_admins": self.extra_add_fields(bound_fields),
+        }
+        if cacheable:
+            self._form_metadata.setdefault(form_class, {})[key] = metadata
+        return metadata
+
+    def datetime_fields(self, forms) -> dict:
+        """
+        选出哪些字段是 日期时间类型 用于前端渲染
+        :param forms: 实例化form对象的字段
+        :return: {字段名: {"elem": 元素id, "type": 类型}}
+        """
+        results = {}
         for form in forms:
             if isinstance(form.field, DateTimeField):
-                results.append({"elem": form.id_for_label, "type": "datetime"})
+                results[form.name] = {"elem": form.id_for_label, "type": "datetime"}
             elif isinstance(form.field, DateField):
-                results.append({"elem": form.id_for_label, "type": "date"})
+                results[form.name] = {"elem": form.id_for_label, "type": "date"}
             elif isinstance(form.field, TimeField):
-                results.append({"elem": form.id_for_label, "type": "time"})
+                results[form.name] = {"elem": form.id_for_label, "type": "time"}
         return results
 
-    def file_fields(self, forms) -> list:
+    def file_fields(self, forms) -> dict:
         """
         选出哪些字段是 文件类型 用于前端渲染
-        :param forms: 实例化form对象
-        :return:
+        :param forms: 实例化form对象的字段
+        :return: {字段名: {"elem": 元素id, "type": 类型}}
         """
-        results = []
+        results = {}
         for form in forms:
             if isinstance(form.field, ImageField):
-                results.append({"elem": form.id_for_label, "type": "image"})
+                results[form.name] = {"elem": form.id_for_label, "type": "image"}
             elif isinstance(form.field, FileField):
-                results.append({"elem": form.id_for_label, "type": "file"})
+                results[form.name] = {"elem": form.id_for_label, "type": "file"}
 
         return results
 
-    def extra_add_fields(self, forms):
+    def extra_add_fields(self, forms) -> dict:
         """
         添加或编辑页面，对跨表字段增加添加按钮
-        :param forms: form实例化对象
-        :return:
+        :param forms: 实例化form对象的字段
+        :return: {字段名: 关联模型的ModelAdmin}
         """
         if not self.extra_add:
             return {}
         results = {}
         for form in forms:
-            field = self.model._meta.get_field(form.name)
+            try:
+                field = self.model._meta.get_field(form.name)
+            except FieldDoesNotExist:
+                # 表单自定义的字段
+                continue
             if isinstance(field, ManyToManyField) or isinstance(field, ForeignKey):
-                try:
-                    info = field.related_model._meta.app_label, field.related_model._meta.model_name
-                    url = reverse("kingadmin:%s_%s_add" % info)
-                    results[form.name] = url
-                except NoReverseMatch:
-                    continue
+                # 关联模型没有注册时 没有添加页面
+                related_admin = self.admin_site._registry.get(field.related_model)
+                if related_admin is not None:
+                    results[form.name] = related_admin
 
         return results
 
@@ -616,6 +1608,7 @@ class AdminSite(object):
 
         urlpatterns += [url("^$", self.home, name="home")]
         urlpatterns += [url("^welcome/$", self.welcome, name="welcome")]
+        urlpatterns += [url("^jobs/(?P<pk>\d+)/$", self.job_status, name="job_status")]
         return urlpatterns
 
     @property
@@ -628,5 +1621,14 @@ class AdminSite(object):
     def welcome(self, request):
         return render(request, "kingadmin/welcome.html")
 
+    def job_status(self, request, pk):
+        """
+        查询后台任务的状态、进度和结果
+        """
+        job = Job.objects.filter(pk=pk).first()
+        if job is None:
+            return JsonResponse({"code": 401, "msg": "任务不存在"})
+        return JsonResponse({"code": 200, "msg": "", "job": job.to_dict()})
+
 
 site = AdminSite()
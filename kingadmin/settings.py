@@ -14,11 +14,36 @@ DEFAULTS = {
     'PAGE_COUNT': 5,  # 分页显示几个页面
     'TOTAL_PAGE_NUM': 200,  # 总页码数
     'PAGE_QUERY': 'page',  # 页码url查询参数
+    'CURSOR_QUERY': 'cursor',  # 游标分页 url查询参数
+    'COUNT_CACHE_TIMEOUT': 60,  # 缓存计数 缓存秒数
+    'ESTIMATED_COUNT_THRESHOLD': 10000,  # 估算计数 统计行数大于该值时使用估算值
 
     # Filtering
     'SEARCH_PARAM': 'search',  # 关键搜索参数
+    'FILTER_CACHE_TIMEOUT': 300,  # 条件筛选数据 缓存秒数
+    'FILTER_VALUES_LIMIT': 50,  # 条件筛选 本表普通字段最多显示多少个不同的值
     'ORDERING_PARAM': 'ordering',
 
+    # Export
+    'EXPORT_FORMAT_PARAM': 'format',  # 导出格式url查询参数 可选值 csv xlsx
+    'DATA_RENDER_PARAM': 'render',  # json数据接口 值为1时返回表格html的url查询参数
+    'EXPORT_CHUNK_SIZE': 2000,  # 导出时 每次从数据库读取多少条数据
+
+    # Delete
+    'DELETE_CHUNK_SIZE': 1000,  # 删除时 每个事务删除多少条数据
+
+    # Job
+    'JOB_WORKERS': 2,  # 后台任务 线程池线程数
+
+    # Import
+    'IMPORT_BATCH_SIZE': 1000,  # 导入时 每批校验、写入多少条数据
+
+    # Update
+    'UPDATE_CHUNK_SIZE': 1000,  # 批量修改时 每条 UPDATE 语句修改多少条数据
+
+    # Autocomplete
+    'AUTOCOMPLETE_PAGE_SIZE': 20,  # 外键、多对多字段自动补全 每页多少条数据
+
     # Authentication
     'UNAUTHENTICATED_USER': 'django.contrib.auth.models.AnonymousUser',
     'UNAUTHENTICATED_TOKEN': None,
@@ -27,7 +52,7 @@ DEFAULTS = {
     'DATE_FORMAT': "",
     'DATE_INPUT_FORMATS': "",
 
-    'DATETIME_FORMAT': "",
+    'DATETIME_FORMAT': "",  # 展示页时间字段格式 默认 %Y-%m-%d %H:%M:%S
     'DATETIME_INPUT_FORMATS': "",
 
     'TIME_FORMAT': "",
@@ -1,7 +1,8 @@
 from django import template
-from django.db.models import ManyToManyField
-from django.urls import reverse
+from django.utils.formats import localize
+from django.utils.html import conditional_escape
 from django.utils.safestring import mark_safe
+from django.utils.timezone import template_localtime
 
 from kingadmin.fields import Field
 
@@ -32,12 +33,11 @@ def table_thead(info_dict):
     return thead
 
 
-def table_option_edit(app_label, model_name, pk):
+def table_option_edit(url):
     """
     编辑按钮
     """
 
-    url = reverse("kingadmin:%s_%s_change" % (app_label, model_name), kwargs={"pk": pk})
     return f"""
           <a title="编辑" onclick="xadmin.open('编辑','{url}')" href="javascript:;" class="layui-btn">
               <i class="layui-icon">&#xe642;</i>编辑
@@ -45,12 +45,11 @@ def table_option_edit(app_label, model_name, pk):
           """
 
 
-def table_option_delete(app_label, model_name, pk):
+def table_option_delete(url):
     """
     删除按钮
     """
 
-    url = reverse("kingadmin:%s_%s_delete" % (app_label, model_name), kwargs={"pk": pk})
     return f""" 
           <a title="删除" onclick="member_del(this,'{url}')" href="javascript:;" class="layui-btn layui-btn-danger">
               <i class="layui-icon">&#xe640;</i>删除
@@ -58,27 +57,26 @@ def table_option_delete(app_label, model_name, pk):
           """
 
 
-def table_tbody_options(info_dict, result):
+def table_tbody_options(info_dict, pk):
     """
     构建每一行的 操作列
     :param info_dict: 传递信息
-    :param result: 每行数据的实例
+    :param pk: 每行数据的主键
     :return:
     """
     options = []
-    app_label = info_dict["model"]._meta.app_label
-    model_name = info_dict["model"]._meta.model_name
+    admin_class = info_dict["admin_class"]
 
     for option in info_dict["options"]:
         if "edit" == option:
-            options.append(table_option_edit(app_label, model_name, result.pk))
+            options.append(table_option_edit(admin_class.get_url("change", pk)))
         elif "delete" == option:
-            options.append(table_option_delete(app_label, model_name, result.pk))
+            options.append(table_option_delete(admin_class.get_url("delete", pk)))
         elif hasattr(info_dict["admin_class"], option):
             attr = getattr(info_dict["admin_class"], option)
 
             if callable(attr):
-                options.append(attr(info_dict["model"], result.pk))
+                options.append(attr(info_dict["model"], pk))
             else:
                 raise Exception(f"{option} 应该定义成一个方法")
         else:
@@ -89,7 +87,7 @@ def table_tbody_options(info_dict, result):
 
 def table_row(info_dict, instance):
     """
-    构建表格一行数据
+    构建表格一行数据 依次调用预先编译好的每列渲染函数
     """
 
     row = []
@@ -97,77 +95,77 @@ def table_row(info_dict, instance):
     if info_dict.get("has_checkbox"):
         row.append(mark_safe(f'<input type="checkbox" name="pk" value="{instance.pk}" lay-skin="primary">'))
 
-    opts = getattr(instance, "_meta", None)
-    assert opts is not None
-
-    for index, column_name in enumerate(info_dict.get("list_display")):
-
-        if isinstance(column_name, Field):
-            # 自定义展示字段 会覆盖models中的字段
-            row.append(mark_safe(f"{column_name.to_representation(column_name.get_attribute(instance))}"))
-
-        elif hasattr(instance, column_name):
-            # models中的字段
-            field_obj = opts.get_field(column_name)
-
-            if getattr(field_obj, "choices", None):  # choices type
-                row.append(getattr(instance, f"get_{column_name}_display"))
-            elif "DateTimeField" in field_obj.__repr__():  # 时间类型字段
-                column_data = getattr(instance, column_name).strftime("%Y-%m-%d %H:%M:%S") \
-                    if getattr(instance, column_name) else ""
-                row.append(column_data)
-            elif "BooleanField" in field_obj.__repr__():  # 布尔值类型字段
-                column_data = '''
-                        <input type="checkbox" disabled %s lay-skin="switch" lay-text="ON|OFF">
-                    ''' % ("checked" if getattr(instance, column_name, 0) == 1 else "")
-                row.append(mark_safe(column_data))
-            elif isinstance(field_obj, ManyToManyField):
-                # 判断表格展示字段是否是多对多
-                '''
-                如果有 自定义 kingadmin类中 有 list_{field} 方法则调用该方法
-                eg: 
-                class BookAdmin(ModelAdmin):
-                    list_display = ["title", "publisher"] # publisher 是多对多字段
-                    ...
-
-                    def list_publisher(self,instance): # instance 表示该行数据的 model实例
-                        return " ".join(", ".join([str(item) for item in data_m2m] or []))
-
-                '''
-                if hasattr(info_dict["admin_class"], f"list_{column_name}"):
-                    func = getattr(info_dict["admin_class"], f"list_{column_name}")
-                    row.append(func(instance))
-                else:
-                    if hasattr(instance, column_name):
-                        data_m2m = getattr(instance, column_name).all()
-                        row.append(", ".join([str(item) for item in data_m2m] or []))
-                    else:
-                        row.append("")
-            else:
-                row.append(getattr(instance, column_name, ""))
+    for render in info_dict["renderers"]:
+        row.append(render(instance))
 
-        else:
-            raise KeyError("cannot find column %s in model" % column_name)
+    options = table_tbody_options(info_dict, instance.pk)
+    if options:
+        row.append(options)
+
+    return row
+
+
+def table_values_row(info_dict, values):
+    """
+    values模式 构建表格一行数据
+    :param values: values_list 查询的一行数据 (主键, 展示列...)
+    """
+
+    row = []
+    pk, values = values[0], values[1:]
 
-    options = table_tbody_options(info_dict, instance)
+    if info_dict.get("has_checkbox"):
+        row.append(mark_safe(f'<input type="checkbox" name="pk" value="{pk}" lay-skin="primary">'))
+
+    for render, value in zip(info_dict["renderers"], values):
+        row.append(render(value))
+
+    options = table_tbody_options(info_dict, pk)
     if options:
         row.append(options)
 
     return row
 
 
-def table_tbody(info_dict):
-    table_data_list = []
+def iter_tbody(info_dict):
+    """
+    逐行构建表格数据
+    """
     for result in info_dict["queryset"]:
-        if info_dict["list_display"]:
+        if info_dict.get("values_mode"):
+
+            yield table_values_row(info_dict, result)
+
+        elif info_dict["list_display"]:
 
-            row = table_row(info_dict, result)
+            yield table_row(info_dict, result)
 
-            table_data_list.append(row)
         else:
-            table_data_list.append([str(result)])
+            yield [str(result)]
+
+
+def table_tbody(info_dict):
+    return list(iter_tbody(info_dict))
+
+
+def render_cell(value):
+    """
+    与模板中 {{ value }} 相同的方式 本地化并转义单元格数据
+    """
+    return conditional_escape(localize(template_localtime(value)))
+
+
+def table_stream(info_dict):
+    """
+    流式响应 逐行生成表格html，与 table_data.html 的结构相同
+    """
+    yield '<table class="layui-table layui-form"><thead><tr>%s</tr></thead><tbody>' % "".join(
+        "<th>%s</th>" % render_cell(header) for header in table_thead(info_dict))
+
+    for row in iter_tbody(info_dict):
+        yield "<tr>%s</tr>" % "".join("<td>%s</td>" % render_cell(data) for data in row)
 
-    return table_data_list
+    yield "</tbody></table>"
 
 
 @register.inclusion_tag("kingadmin/table/table_data.html")
@@ -0,0 +1,49 @@
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+
+def get_version_key(model):
+    return f"kingadmin:version:{model._meta.label_lower}"
+
+
+def get_model_version(*models):
+    """
+    获取模型数据的版本号 用于缓存键，数据变化后版本号改变 旧缓存自动失效
+    版本号不存在(首次使用或被缓存淘汰)时 使用当前时间 避免与旧版本号重复
+    :return: 多个模型的版本号拼接的字符串
+    """
+    keys = [get_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, int(time.time() * 1000), None)
+            versions[key] = cache.get(key)
+    return "-".join(str(versions[key]) for key in keys)
+
+
+def bump_model_version(model):
+    """
+    模型数据变化 更新版本号
+    """
+    key = get_version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def watch_model(model):
+    """
+    监听模型的 save/delete 信号及多对多关系变化，数据变化时更新版本号
+    """
+    uid = f"kingadmin_version_{model._meta.label_lower}"
+
+    def on_change(sender, **kwargs):
+        bump_model_version(model)
+
+    post_save.connect(on_change, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(on_change, sender=model, weak=False, dispatch_uid=uid)
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(on_change, sender=field.remote_field.through, weak=False, dispatch_uid=uid)
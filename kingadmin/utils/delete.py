@@ -0,0 +1,95 @@
+from django.db import router, transaction
+from django.db.models import DO_NOTHING
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.db.models.signals import pre_delete, post_delete
+from django.dispatch.dispatcher import _make_id
+
+
+def get_own_receiver_uids(model):
+    """
+    kingadmin 自己监听该模型删除的信号 快速删除后由 ModelAdmin 手动处理(更新版本号、删除搜索索引)
+    """
+    label = model._meta.label_lower
+    return {f"kingadmin_version_{label}", f"kingadmin_search_{label}"}
+
+
+def has_delete_receivers(model, ignore_uids=()):
+    """
+    判断模型是否有 pre_delete/post_delete 信号的接收函数
+    :param ignore_uids: 忽略的 dispatch_uid
+    """
+    sender_ids = {_make_id(model), _make_id(None)}
+    for signal in (pre_delete, post_delete):
+        for (receiver_key, sender_key), receiver in signal.receivers:
+            if sender_key in sender_ids and receiver_key not in ignore_uids:
+                return True
+    return False
+
+
+def get_fast_delete_relations(model):
+    """
+    判断能否使用 DELETE 语句直接删除，不加载数据、不发送信号
+    条件: 没有删除信号，没有多表继承、GenericRelation，
+         关联到该模型的外键都是 DO_NOTHING 或者是自动创建的多对多中间表(直接删除中间表数据)
+    :return: 需要先删除的多对多中间表关联列表，不能直接删除时返回 None
+    """
+    opts = model._meta
+    if opts.parents or opts.private_fields:
+        return None
+
+    if has_delete_receivers(model, get_own_receiver_uids(model)):
+        return None
+
+    through_relations = []
+    for related in get_candidate_relations_to_delete(opts):
+        if related.field.remote_field.on_delete is DO_NOTHING:
+            continue
+
+        through = related.related_model
+        if through._meta.auto_created and not has_delete_receivers(through):
+            through_relations.append(related)
+            continue
+
+        return None
+
+    return through_relations
+
+
+def delete_in_chunks(queryset, chunk_size, fast_relations=None, on_chunk=None):
+    """
+    按主键分块删除 每块一个事务，级联数据不会一次全部加载到内存，也不会长时间锁表
+    :param chunk_size: 每块条数
+    :param fast_relations: get_fast_delete_relations 的结果，None 时使用 Collector 删除(发送信号、级联删除)
+    :param on_chunk: 每块删除后调用 on_chunk(pks)
+    :return: 删除的条数 不包含级联删除的数据
+    """
+    model = queryset.model
+    using = router.db_for_write(model)
+    manager = model._base_manager.using(using)
+    pk_queryset = queryset.order_by().values_list("pk", flat=True)
+
+    deleted = 0
+    while True:
+        pks = list(pk_queryset[:chunk_size])
+        if not pks:
+            break
+
+        with transaction.atomic(using=using):
+            if fast_relations is None:
+                _, rows = manager.filter(pk__in=pks).delete()
+                count = rows.get(model._meta.label, 0)
+            else:
+                for related in fast_relations:
+                    related.related_model._base_manager.using(using).filter(
+                        **{f"{related.field.name}__in": pks})._raw_delete(using)
+                count = manager.filter(pk__in=pks)._raw_delete(using)
+
+        if on_chunk is not None:
+            on_chunk(pks)
+
+        deleted += count
+        if not count:
+            # 数据没有被删除 避免重复查询到相同的数据
+            break
+
+    return deleted
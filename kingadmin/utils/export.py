@@ -0,0 +1,87 @@
+import csv
+import datetime
+import decimal
+import tempfile
+
+from django.db.models import prefetch_related_objects
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+
+class Echo:
+    """
+    csv.writer 写入时直接返回写入的内容 用于流式输出
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_chunks(queryset, chunk_size, prefetch_related=()):
+    """
+    使用 iterator() 逐块读取数据 不缓存整个查询结果
+    iterator() 不支持 prefetch_related，每块数据单独预加载
+    :param chunk_size: 每块数据条数
+    :param prefetch_related: 预加载字段
+    :return: 每块数据的列表
+    """
+    chunk = []
+    for instance in queryset.iterator():
+        chunk.append(instance)
+        if len(chunk) >= chunk_size:
+            if prefetch_related:
+                prefetch_related_objects(chunk, *prefetch_related)
+            yield chunk
+            chunk = []
+
+    if chunk:
+        if prefetch_related:
+            prefetch_related_objects(chunk, *prefetch_related)
+        yield chunk
+
+
+def iter_csv(headers, rows):
+    """
+    逐行生成csv内容 开头写入BOM 方便Excel识别utf-8编码
+    """
+    writer = csv.writer(Echo())
+    yield "\ufeff" + writer.writerow([str(header) for header in headers])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def xlsx_cell(value):
+    """
+    xlsx 单元格只能写入基本类型 其他类型转成字符串
+    """
+    if value is None or isinstance(value, (bool, int, float, decimal.Decimal, str)):
+        return value
+    if isinstance(value, datetime.datetime):
+        # xlsx 不支持时区
+        return value.replace(tzinfo=None)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value
+    return str(value)
+
+
+def write_xlsx(headers, rows):
+    """
+    使用 openpyxl write_only 模式逐行写入临时文件 内存占用不随数据量增长
+    :return: 写入完成的临时文件 已定位到开头
+    """
+    if Workbook is None:
+        raise ImportError("导出xlsx需要安装 openpyxl")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([str(header) for header in headers])
+    for row in rows:
+        sheet.append([xlsx_cell(value) for value in row])
+
+    file = tempfile.TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return file
@@ -0,0 +1,36 @@
+import csv
+import json
+
+
+def read_csv_rows(file):
+    """
+    逐行读取csv文件 第一行为表头 兼容带BOM的utf-8文件
+    每行单独解码 编码错误时已读取的行不受影响，出错的行号准确
+    :return: 每行数据的字典 {表头: 值}
+    """
+    reader = csv.DictReader(line.decode("utf-8-sig") for line in file)
+    for row in reader:
+        yield row
+
+
+def read_json_rows(file):
+    """
+    读取json文件 内容为对象列表 [{字段名: 值}, ...]
+    """
+    data = json.loads(file.read().decode("utf-8-sig"))
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise ValueError("json文件内容应该是对象列表")
+    return data
+
+
+def read_rows(file):
+    """
+    根据上传文件的扩展名读取数据 支持 csv json
+    :param file: 上传的文件对象
+    """
+    name = (file.name or "").lower()
+    if name.endswith(".json"):
+        return read_json_rows(file)
+    if name.endswith(".csv"):
+        return read_csv_rows(file)
+    raise ValueError("只支持 csv json 文件")
@@ -0,0 +1,100 @@
+import json
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, transaction
+from django.utils.datastructures import MultiValueDict
+
+from kingadmin.models import Job
+from kingadmin.settings import admin_settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    后台任务线程池 第一次提交任务时创建，线程数 JOB_WORKERS
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=admin_settings.JOB_WORKERS,
+                                               thread_name_prefix="kingadmin-job")
+    return _executor
+
+
+class JobRequest:
+    """
+    后台任务中代替 request，请求结束后仍然可以读取 GET POST user
+    """
+    method = "POST"
+
+    def __init__(self, GET, POST, user=None):
+        self.GET = GET
+        self.POST = POST
+        self.FILES = MultiValueDict()
+        self.user = user
+
+    @classmethod
+    def from_request(cls, request):
+        post = request.POST.copy()
+        post.pop("csrfmiddlewaretoken", None)
+        return cls(request.GET.copy(), post, getattr(request, "user", None))
+
+    def to_params(self):
+        return json.dumps({"GET": self.GET.urlencode(), "POST": self.POST.urlencode()})
+
+
+def format_result(result):
+    """
+    批量操作的返回值 转换成保存到任务表的字符串
+    """
+    if result is None:
+        return ""
+    if isinstance(result, str):
+        return result
+    try:
+        return json.dumps(result)
+    except TypeError:
+        return str(result)
+
+
+def run_job(admin_class, job_id, job_request):
+    """
+    在线程池中执行批量操作 func(request, job)
+    """
+    try:
+        job = Job.objects.get(pk=job_id)
+        job.status = Job.RUNNING
+        job.save(update_fields=["status", "update_time"])
+
+        try:
+            result = getattr(admin_class, job.action)(job_request, job)
+        except Exception:
+            job.status, job.result = Job.FAILED, traceback.format_exc()
+        else:
+            job.status, job.result = Job.SUCCESS, format_result(result)
+        job.save(update_fields=["status", "result", "update_time"])
+    finally:
+        # 线程会被复用 关闭本线程的数据库连接
+        connections.close_all()
+
+
+def submit_job(admin_class, request, action):
+    """
+    创建任务记录 事务提交后放入线程池执行
+    :param action: 批量操作方法名
+    :return: 任务
+    """
+    job_request = JobRequest.from_request(request)
+    job = Job.objects.create(
+        content_type=ContentType.objects.get_for_model(admin_class.model),
+        action=action,
+        params=job_request.to_params(),
+    )
+    transaction.on_commit(lambda: get_executor().submit(run_job, admin_class, job.pk, job_request))
+    return job
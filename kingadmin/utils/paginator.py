@@ -1,14 +1,117 @@
+import base64
+import datetime
+import decimal
+import hashlib
+import json
+import uuid
+from functools import reduce
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError
+from django.db import connections, transaction
+from django.db.models import Q
 from django.utils.safestring import mark_safe
 
 from kingadmin.settings import admin_settings
+from kingadmin.utils.cache import get_model_version
+
+
+class ExactCount:
+    """
+    精确计数 直接使用 COUNT(*)
+    """
+
+    def count(self, query_sets, query_params):
+        """
+        获取数据总条数
+        :param query_sets: queryset查询的所有数据
+        :param query_params: request.GET 参数
+        :return: 数据总条数
+        """
+        return query_sets.count()
+
+
+class CachedCount(ExactCount):
+    """
+    缓存计数 相同的过滤、搜索条件在 COUNT_CACHE_TIMEOUT 秒内只计数一次，模型数据变化后重新计数
+    """
+
+    def get_cache_key(self, query_sets, query_params):
+        """
+        缓存键 由规范化后的url参数(去除分页参数) 和 查询语句组成，避免不同用户的 queryset_filter 共用缓存
+        """
+        ignore_params = (admin_settings.PAGE_QUERY, admin_settings.CURSOR_QUERY)
+        params = sorted(
+            (key, sorted(query_params.getlist(key)))
+            for key in query_params if key not in ignore_params
+        ) if query_params else []
+
+        sql = str(query_sets.order_by().query)
+        digest = hashlib.md5(json.dumps([params, sql]).encode()).hexdigest()
+        version = get_model_version(query_sets.model)
+        return f"kingadmin:count:{query_sets.model._meta.label_lower}:{version}:{digest}"
+
+    def count(self, query_sets, query_params):
+        try:
+            key = self.get_cache_key(query_sets, query_params)
+        except EmptyResultSet:
+            return 0
+
+        total_num = cache.get(key)
+        if total_num is None:
+            total_num = super(CachedCount, self).count(query_sets, query_params)
+            cache.set(key, total_num, admin_settings.COUNT_CACHE_TIMEOUT)
+        return total_num
+
+
+class EstimatedCount(CachedCount):
+    """
+    估算计数 没有过滤条件时使用数据库统计信息估算总条数，有过滤条件或数据量小于 ESTIMATED_COUNT_THRESHOLD 时使用缓存计数
+    """
+
+    estimate_sql = {
+        "postgresql": "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+        "mysql": "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        "sqlite": "SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND idx IS NULL",
+    }
+
+    def estimate(self, query_sets):
+        """
+        从数据库统计信息中获取表的估算行数 不支持的数据库返回 None
+        """
+        connection = connections[query_sets.db]
+        sql = self.estimate_sql.get(connection.vendor)
+        if sql is None:
+            return None
+
+        try:
+            # 使用保存点 避免统计表不存在时 影响外层事务
+            with transaction.atomic(using=query_sets.db), connection.cursor() as cursor:
+                cursor.execute(sql, [query_sets.model._meta.db_table])
+                row = cursor.fetchone()
+        except Exception:
+            return None
+
+        if not row or row[0] is None:
+            return None
+        return int(str(row[0]).split()[0])
+
+    def count(self, query_sets, query_params):
+        if not query_sets.query.where:
+            total_num = self.estimate(query_sets)
+            if total_num is not None and total_num >= admin_settings.ESTIMATED_COUNT_THRESHOLD:
+                return total_num
+
+        return super(EstimatedCount, self).count(query_sets, query_params)
 
 
 class Paginator:
-    def __init__(self, query_sets, query_params={}):
+    def __init__(self, query_sets, query_params={}, count_strategy=None):
         """
         分页初始化方法
         :param query_sets: queryset查询的所有数据
         :param query_params: request.GET 参数
+        :param count_strategy: 计数策略 ExactCount CachedCount EstimatedCount 默认 ExactCount
         """
         current_page = query_params.get(admin_settings.PAGE_QUERY, 1)
         try:
@@ -22,12 +125,18 @@ class Paginator:
             print("分页错误", e)
             current_page = 1
 
-        if query_sets:
-            self.query_sets = query_sets[:admin_settings.TOTAL_PAGE_NUM * admin_settings.PRE_PAGE_NUM]
-            self.total_num = len(self.query_sets)
-        else:
-            self.query_sets = query_sets
-            self.total_num = self.query_sets.count()
+        if current_page < 1:
+            current_page = 1
+
+        if count_strategy is None:
+            count_strategy = ExactCount()
+
+        # 只计数 不加载数据 总条数不超过 总页码数 * 每页条数
+        self.query_sets = query_sets
+        self.total_num = min(
+            count_strategy.count(query_sets, query_params),
+            admin_settings.TOTAL_PAGE_NUM * admin_settings.PRE_PAGE_NUM
+        )
 
         self.query_params = query_params
 
@@ -143,10 +252,255 @@ class Paginator:
         </div>      
         ''' % (previous_html, inner_html, next_html))
 
+        return page_html, self.get_page()
+
+    def get_page(self):
+        """
+        当前页数据
+        """
         start = (self.current_page - 1) * admin_settings.PRE_PAGE_NUM
-        if self.query_sets:
-            page_obj = self.query_sets[start:start + admin_settings.PRE_PAGE_NUM]
+        if self.total_num:
+            return self.query_sets[start:start + admin_settings.PRE_PAGE_NUM]
+        return self.query_sets.none()
+
+    def get_page_info(self):
+        """
+        分页信息 用于json数据接口
+        """
+        return {
+            "page": self.current_page,
+            "page_num": self.max_page_num,
+            "page_size": admin_settings.PRE_PAGE_NUM,
+            "total": self.total_num,
+        }
+
+
+class KeysetPaginator:
+    """
+    游标分页（keyset/seek）
+    根据排序字段 + 主键 记录当前页首尾数据的排序值，翻页时使用 where 条件定位，不使用 offset
+    注意: 只能上一页、下一页 不能跳页
+    排序字段只能是数据库列(可以跨表)，外键按 字段名_id 排序，可以先用 resolve_ordering 判断能否使用
+    """
+
+    def __init__(self, query_sets, ordering=(), query_params={}):
+        """
+        游标分页初始化方法
+        :param query_sets: queryset查询的所有数据
+        :param ordering: 排序字段 升序 字段名 降序 -字段名
+        :param query_params: request.GET 参数
+        """
+        self.query_params = query_params
+
+        resolved = self.resolve_ordering(query_sets.model, ordering)
+        if resolved is None:
+            raise ValueError(f"排序字段 {list(ordering)} 不能使用游标分页")
+        self.ordering = [name for name, field in resolved]
+        self.fields = [field for name, field in resolved]
+
+        cursor = self.decode_cursor(query_params.get(admin_settings.CURSOR_QUERY, ""))
+        self.reverse = bool(cursor) and cursor["d"] == "p"
+
+        # 排序与定位条件使用相同的列(外键 字段名_id、追加的主键)
+        if self.reverse:
+            query_sets = query_sets.order_by(*[self.invert(field) for field in self.ordering])
+        else:
+            query_sets = query_sets.order_by(*self.ordering)
+
+        if cursor:
+            query_sets = query_sets.filter(self.seek_condition(cursor["v"]))
+
+        rows = list(query_sets[:admin_settings.PRE_PAGE_NUM + 1])
+        has_more = len(rows) > admin_settings.PRE_PAGE_NUM
+        rows = rows[:admin_settings.PRE_PAGE_NUM]
+
+        if self.reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
         else:
-            page_obj = self.query_sets
+            self.has_previous, self.has_next = bool(cursor), has_more
+
+        self.query_sets = rows
+
+    @classmethod
+    def resolve_ordering(cls, model, ordering):
+        """
+        将排序字段转换成数据库列 外键使用 字段名_id(按关联模型 Meta.ordering 排序时定位条件不成立)，没有主键时追加主键
+        :return: [(排序字段, 模型字段)] 有表达式、随机排序、多对多、反向关联等非数据库列，
+                 或者可以为空的列(定位条件不能比较空值)时返回 None
+        """
+        resolved = []
+        for name in ordering:
+            if not isinstance(name, str) or name == "?":
+                return None
+
+            prefix = "-" if name.startswith("-") else ""
+            parts = name.lstrip("-").split("__")
+            opts = model._meta
+            for index, part in enumerate(parts):
+                try:
+                    field = opts.pk if part == "pk" else opts.get_field(part)
+                except FieldDoesNotExist:
+                    return None
+                if not field.concrete or field.many_to_many or field.null:
+                    return None
+
+                if index < len(parts) - 1:
+                    if not field.is_relation:
+                        return None
+                    opts = field.related_model._meta
+                elif field.is_relation:
+                    parts[index] = field.attname
+
+            resolved.append((prefix + "__".join(parts), field))
+
+        pk = model._meta.pk
+        if not {"pk", pk.name, pk.attname} & {name.lstrip("-") for name, field in resolved}:
+            resolved.append((pk.attname, pk))
+        return resolved
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
 
-        return page_html, page_obj
+    @staticmethod
+    def encode_value(value):
+        """
+        游标中的值 日期时间使用 isoformat 保留微秒，否则定位条件会跳过数据
+        """
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, (decimal.Decimal, uuid.UUID)):
+            return str(value)
+        raise TypeError(f"{value!r} 不能写入游标")
+
+    def encode_cursor(self, values, direction):
+        data = json.dumps({"v": values, "d": direction}, default=self.encode_value)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """
+        解析游标 值按排序字段类型转换，游标无效(被修改、排序字段已变化)时返回 None 显示第一页
+        """
+        if not cursor:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            values = data["v"]
+            if data["d"] not in ("n", "p") or not isinstance(values, list) or len(values) != len(self.fields):
+                return None
+            data["v"] = [field.to_python(value) for field, value in zip(self.fields, values)]
+            return data
+        except (ValueError, TypeError, KeyError, ValidationError):
+            return None
+
+    def seek_condition(self, values):
+        """
+        构建定位条件 (a > x) or (a = x and b > y) or ...
+        """
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self.invert(field) for field in ordering]
+
+        query = Q()
+        query.connector = "OR"
+        for index, field in enumerate(ordering):
+            lookup = "lt" if field.startswith("-") else "gt"
+            conditions = [Q(**{ordering[i].lstrip("-"): values[i]}) for i in range(index)]
+            conditions.append(Q(**{f"{field.lstrip('-')}__{lookup}": values[index]}))
+            query.children.append(reduce(lambda a, b: a & b, conditions))
+        return query
+
+    def get_values(self, instance):
+        """
+        获取一行数据的排序值，支持跨表字段 eg: publisher__name
+        """
+        values = []
+        for field in self.ordering:
+            value = instance
+            for attr in field.lstrip("-").split("__"):
+                value = getattr(value, attr, None)
+            values.append(value)
+        return values
+
+    def get_html(self):
+
+        # 判断是否有get请求
+        if self.query_params:
+            query = self.query_params.copy()
+            for key in (admin_settings.CURSOR_QUERY, admin_settings.PAGE_QUERY):
+                if query.get(key):
+                    query.pop(key)
+
+            urlencode = query.urlencode()
+            query_url = "&" + urlencode if urlencode else urlencode
+        else:
+            query_url = ""
+
+        previous_cursor, next_cursor = self.get_cursors()
+
+        # 组装上一页
+        if previous_cursor:
+            previous_html = f'''
+                  <a href="?{admin_settings.CURSOR_QUERY}={previous_cursor}{query_url}" class="prev" >
+                    上一页
+                  </a>
+            '''
+        else:
+            previous_html = '''
+                             <a href="javascript:void();" class="layui-disabled">
+                               上一页
+                             </a>
+                           '''
+        # 组装下一页
+        if next_cursor:
+            next_html = f'''
+                      <a href="?{admin_settings.CURSOR_QUERY}={next_cursor}{query_url}" class="next">
+                        下一页
+                      </a>
+                    '''
+        else:
+            next_html = '''
+                          <a href="javascript:void();" class="layui-disabled">
+                            下一页
+                          </a>
+                        '''
+
+        page_html = mark_safe('''
+        <div class="layui-box layui-laypage layui-laypage-default">
+          <div>
+            %s
+            %s
+          </div>
+        </div>
+        ''' % (previous_html, next_html))
+
+        return page_html, self.get_page()
+
+    def get_cursors(self):
+        """
+        上一页、下一页的游标 不存在时为 None
+        """
+        previous_cursor = next_cursor = None
+        if self.has_previous and self.query_sets:
+            previous_cursor = self.encode_cursor(self.get_values(self.query_sets[0]), "p")
+        if self.has_next and self.query_sets:
+            next_cursor = self.encode_cursor(self.get_values(self.query_sets[-1]), "n")
+        return previous_cursor, next_cursor
+
+    def get_page(self):
+        """
+        当前页数据
+        """
+        return self.query_sets
+
+    def get_page_info(self):
+        """
+        分页信息 用于json数据接口 游标分页不统计总条数
+        """
+        previous_cursor, next_cursor = self.get_cursors()
+        return {
+            "page_size": admin_settings.PRE_PAGE_NUM,
+            "previous": previous_cursor,
+            "next": next_cursor,
+        }
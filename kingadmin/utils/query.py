@@ -0,0 +1,187 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+
+from kingadmin.fields import Field
+
+
+def get_relation_fields(model):
+    """
+    获取模型中 属性名 与 字段对象 的对应关系，反向关联使用 related_name 或 xxx_set 作为属性名
+    :param model: 模型类
+    :return: {属性名: 字段对象}
+    """
+    relation_fields = {}
+    for field in model._meta.get_fields():
+        if field.auto_created and not field.concrete:
+            relation_fields[field.get_accessor_name()] = field
+        else:
+            relation_fields[field.name] = field
+    return relation_fields
+
+
+def get_source_path(column):
+    """
+    获取展示列对应的属性路径
+    :param column: list_display中的元素 字段名字符串 或 Field实例
+    :return: 属性列表 eg: ["editorial_staff", "first", "name"]
+    """
+    if isinstance(column, Field):
+        return column.source_attrs
+    return [column]
+
+
+def get_related_lookups(model, list_display):
+    """
+    根据展示列分析需要的跨表查询
+    正向外键/一对一 使用 select_related, 多对多/反向关联 使用 prefetch_related
+    :param model: 模型类
+    :param list_display: 展示列 字段名字符串 或 Field实例
+    :return: (select_related列表, prefetch_related列表)
+    """
+    select_related, prefetch_related = [], []
+
+    for column in list_display:
+        current_model = model
+        path, is_prefetch = [], False
+
+        for attr in get_source_path(column):
+            field = get_relation_fields(current_model).get(attr)
+            if field is None or not field.is_relation or field.related_model is None:
+                # 非跨表字段 或 方法、属性 无法继续分析
+                break
+
+            path.append(attr)
+            if field.many_to_many or field.one_to_many:
+                is_prefetch = True
+            current_model = field.related_model
+
+        if not path:
+            continue
+
+        lookup = "__".join(path)
+        target = prefetch_related if is_prefetch else select_related
+        if lookup not in target:
+            target.append(lookup)
+
+    return select_related, prefetch_related
+
+
+def get_only_fields(model, list_display, ordering=()):
+    """
+    根据展示列分析需要查询的字段 用于 queryset.only()
+    自定义方法、属性、MethodField 等无法分析用到哪些字段 返回 None 表示查询所有字段
+    :param model: 模型类
+    :param list_display: 展示列 字段名字符串 或 Field实例
+    :param ordering: 排序字段 游标分页需要读取排序字段的值
+    :return: 字段名列表 或 None
+    """
+    if not list_display:
+        # 没有展示列时 使用 __str__ 展示
+        return None
+
+    relation_fields = get_relation_fields(model)
+    pk_name = model._meta.pk.name
+    only_fields = [pk_name]
+
+    for column in list_display:
+        source_path = get_source_path(column)
+        if not source_path:
+            return None
+
+        field = relation_fields.get(source_path[0])
+        if field is None:
+            return None
+
+        if field.concrete and not field.many_to_many and field.name not in only_fields:
+            only_fields.append(field.name)
+
+    for field_name in ordering:
+        if not isinstance(field_name, str):
+            continue
+        field = relation_fields.get(field_name.lstrip("-").split("__")[0])
+        if field is not None and field.concrete and not field.many_to_many and field.name not in only_fields:
+            only_fields.append(field.name)
+
+    return only_fields
+
+
+def get_values_fields(model, list_display):
+    """
+    展示列全部是本表普通字段时 可以直接使用 values_list 查询 不需要实例化模型
+    :param model: 模型类
+    :param list_display: 展示列 字段名字符串 或 Field实例
+    :return: 字段名列表 或 None
+    """
+    if not list_display:
+        return None
+
+    relation_fields = get_relation_fields(model)
+    for column in list_display:
+        if isinstance(column, Field):
+            return None
+
+        field = relation_fields.get(column)
+        if field is None or not field.concrete or field.is_relation:
+            return None
+
+    return list(list_display)
+
+
+def lookup_multi_valued(model, lookup):
+    """
+    判断查询路径是否经过多对多或反向关联，经过时关联查询会导致主表数据重复
+    :param model: 模型类
+    :param lookup: 查询路径 eg: publisher__name editorial_staff__in
+    """
+    opts = model._meta
+    for part in lookup.lstrip("-").split("__"):
+        try:
+            field = opts.get_field(part)
+        except FieldDoesNotExist:
+            # 查询类型 eg: in contains
+            return False
+
+        if field.many_to_many or field.one_to_many:
+            return True
+        if not field.is_relation or field.related_model is None:
+            return False
+        opts = field.related_model._meta
+
+    return False
+
+
+def get_lookup_field(model, path):
+    """
+    获取查询路径最后的模型字段 外键返回关联的字段
+    :param path: 查询路径 eg: publisher__id
+    :return: 模型字段 路径不是字段时返回 None
+    """
+    opts = model._meta
+    field = None
+    for part in path.split("__"):
+        if field is not None:
+            if not field.is_relation or field.related_model is None:
+                return None
+            opts = field.related_model._meta
+        try:
+            field = opts.pk if part == "pk" else opts.get_field(part)
+        except FieldDoesNotExist:
+            return None
+
+    if field is not None and field.is_relation:
+        field = getattr(field, "target_field", None)
+    return field
+
+
+def get_lookup_condition(model, lookup, value):
+    """
+    构建查询条件，经过多对多或反向关联的查询使用 pk__in 子查询，主表不做关联 不需要 distinct
+    :param model: 模型类
+    :param lookup: 查询路径
+    :param value: 查询值
+    :return: Q对象
+    """
+    condition = Q(**{lookup: value})
+    if lookup_multi_valued(model, lookup):
+        condition = Q(pk__in=model.objects.filter(condition).values("pk"))
+    return condition
@@ -0,0 +1,150 @@
+from django.db.models import DateTimeField, BooleanField, NullBooleanField, ManyToManyField
+from django.test.signals import setting_changed
+from django.utils.html import strip_tags
+from django.utils.safestring import mark_safe
+
+from kingadmin.fields import Field
+from kingadmin.settings import admin_settings
+
+DEFAULT_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SWITCH_HTML = '<input type="checkbox" disabled %s lay-skin="switch" lay-text="ON|OFF">'
+SWITCH_ON = mark_safe(SWITCH_HTML % "checked")
+SWITCH_OFF = mark_safe(SWITCH_HTML % "")
+
+# 展示列渲染方案缓存 {(admin, 展示列, 是否values模式, 是否纯文本): [渲染函数...]}
+_render_plans = {}
+
+
+def clear_render_plans(*args, **kwargs):
+    """
+    KING_ADMIN 配置变化时 清空渲染方案 下次请求重新编译
+    """
+    if kwargs.get("setting") == "KING_ADMIN":
+        _render_plans.clear()
+
+
+setting_changed.connect(clear_render_plans)
+
+
+def identity(value):
+    return value
+
+
+def compile_value_renderer(field_obj, plain=False):
+    """
+    根据字段类型生成 字段值 -> 展示内容 的渲染函数
+    :param field_obj: 模型字段对象
+    :param plain: 是否生成纯文本 用于导出 布尔值不渲染成开关
+    """
+    if getattr(field_obj, "choices", None):
+        choices = dict(field_obj.flatchoices)
+        return lambda value: choices.get(value, value)
+
+    if isinstance(field_obj, DateTimeField):
+        datetime_format = admin_settings.DATETIME_FORMAT or DEFAULT_DATETIME_FORMAT
+        return lambda value: value.strftime(datetime_format) if value else ""
+
+    if isinstance(field_obj, (BooleanField, NullBooleanField)) and not plain:
+        return lambda value: SWITCH_ON if value == 1 else SWITCH_OFF
+
+    return identity
+
+
+def compile_field_renderer(column, plain=False):
+    """
+    自定义展示字段 Field实例 的渲染函数
+    :param plain: 是否生成纯文本 去掉html标签
+    """
+    if plain:
+        return lambda instance: strip_tags(f"{column.to_representation(column.get_attribute(instance))}")
+
+    def render(instance):
+        return mark_safe(f"{column.to_representation(column.get_attribute(instance))}")
+
+    return render
+
+
+def compile_m2m_renderer(admin, column_name):
+    """
+    多对多字段的渲染函数
+    kingadmin类中 有 list_{field} 方法则调用该方法
+    eg:
+    class BookAdmin(ModelAdmin):
+        list_display = ["title", "publisher"] # publisher 是多对多字段
+        ...
+
+        def list_publisher(self,instance): # instance 表示该行数据的 model实例
+            return ", ".join([str(item) for item in instance.publisher.all()])
+    """
+    func = getattr(admin, f"list_{column_name}", None)
+    if func is not None:
+        return func
+
+    def render(instance):
+        return ", ".join([str(item) for item in getattr(instance, column_name).all()])
+
+    return render
+
+
+def compile_column_renderer(value_renderer, column_name):
+    """
+    本表字段的渲染函数 读取属性后交给字段类型对应的渲染函数
+    """
+
+    def render(instance):
+        return value_renderer(getattr(instance, column_name, ""))
+
+    return render
+
+
+def compile_row_renderers(admin, list_display, plain=False):
+    """
+    将展示列编译成 模型实例 -> 单元格内容 的渲染函数列表
+    :param admin: ModelAdmin实例
+    :param list_display: 展示列 字段名字符串 或 Field实例
+    :param plain: 是否生成纯文本 用于导出
+    """
+    model = admin.model
+    opts = model._meta
+    renderers = []
+
+    for column in list_display:
+        if isinstance(column, Field):
+            # 自定义展示字段 会覆盖models中的字段
+            renderers.append(compile_field_renderer(column, plain))
+        elif hasattr(model, column):
+            field_obj = opts.get_field(column)
+            if isinstance(field_obj, ManyToManyField):
+                renderers.append(compile_m2m_renderer(admin, column))
+            else:
+                renderers.append(compile_column_renderer(compile_value_renderer(field_obj, plain), column))
+        else:
+            raise KeyError("cannot find column %s in model" % column)
+
+    return renderers
+
+
+def compile_values_renderers(admin, list_display, plain=False):
+    """
+    values模式 将展示列编译成 字段值 -> 单元格内容 的渲染函数列表
+    """
+    opts = admin.model._meta
+    return [compile_value_renderer(opts.get_field(column), plain) for column in list_display]
+
+
+def get_render_plan(admin, list_display, values_mode=False, plain=False):
+    """
+    获取展示列的渲染函数列表 每种展示列组合只编译一次
+    :param admin: ModelAdmin实例
+    :param list_display: 展示列 字段名字符串 或 Field实例
+    :param values_mode: 是否values模式
+    :param plain: 是否生成纯文本 用于导出
+    """
+    key = (admin, tuple(column.field_name if isinstance(column, Field) else column
+                        for column in list_display), values_mode, plain)
+    plan = _render_plans.get(key)
+    if plan is None:
+        compile_func = compile_values_renderers if values_mode else compile_row_renderers
+        plan = _render_plans[key] = compile_func(admin, list_display, plain)
+    return plan
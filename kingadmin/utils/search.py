@@ -0,0 +1,454 @@
+import re
+import shlex
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connections, router, transaction
+from django.db.models import Q, Count
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+
+from kingadmin.models import SearchToken
+from kingadmin.utils.query import get_lookup_condition, get_lookup_field
+
+
+SEARCH_LOOKUPS = {
+    "=": "exact",
+    "^": "istartswith",
+    "#": "number",
+}
+
+NUMBER_RE = re.compile(r"-?\d+(\.\d+)?")
+
+
+class SubquerySQL(RawSQL):
+    """
+    原生SQL子查询 用于 pk__in 查询
+    RawSQL 自带括号，在 IN 中会被当作单个值
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def get_search_fields(list_search):
+    """
+    解析 list_search 中每个字段的查询类型
+    "=name" 精确匹配 "^name" 前缀匹配 "#id" 数字相等(关键字不是数字时跳过) "name" 包含
+    :return: [(字段, 查询类型)]
+    """
+    search_fields = []
+    for field in list_search:
+        lookup = SEARCH_LOOKUPS.get(field[:1])
+        if lookup:
+            search_fields.append((field[1:], lookup))
+        else:
+            search_fields.append((field, "contains"))
+    return search_fields
+
+
+def parse_search_terms(keyword, field_names):
+    """
+    解析搜索语法 空格分隔的多个词之间是且的关系，引号内为一个词，字段:值 只搜索该字段
+    eg: 北京 name:"人民 出版社"
+    :param keyword: 搜索关键字
+    :param field_names: 可搜索的字段
+    :return: [(字段 或 None, 值)]
+    """
+    try:
+        words = shlex.split(keyword)
+    except ValueError:
+        # 引号不成对
+        words = keyword.split()
+
+    terms = []
+    for word in words:
+        field, sep, value = word.partition(":")
+        if sep and value and field in field_names:
+            terms.append((field, value))
+        elif word:
+            terms.append((None, word))
+    return terms
+
+
+class SearchBackend:
+    """
+    搜索后端基类
+    """
+
+    def register(self, admin_class):
+        """
+        ModelAdmin 初始化时调用，可用于注册信号
+        """
+        pass
+
+    def search(self, admin_class, request, queryset, keyword):
+        """
+        根据关键字过滤数据
+        :param admin_class: ModelAdmin实例
+        :param request: 当前请求
+        :param queryset: queryset查询的所有数据
+        :param keyword: 搜索关键字
+        :return: 过滤后的 queryset
+        """
+        raise NotImplementedError(f"{self.__class__.__name__}.search() must be implemented")
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """
+    默认搜索 每个词按 list_search 中声明的查询类型搜索各字段，满足其一即可
+    精确匹配、前缀匹配、数字相等 可以使用数据库索引
+    """
+
+    def get_condition(self, admin_class, field, lookup, value):
+        """
+        构建一个字段的查询条件
+        :return: Q对象 查询类型与值不匹配时返回 None
+        """
+        if lookup == "number":
+            if not NUMBER_RE.fullmatch(value):
+                return None
+            lookup = "exact"
+
+        if lookup == "exact":
+            # 按字段类型转换 eg: 整数字段搜索 1.5 或文字时跳过
+            target = get_lookup_field(admin_class.model, field)
+            if target is not None:
+                try:
+                    value = target.to_python(value)
+                except ValidationError:
+                    return None
+        return get_lookup_condition(admin_class.model, f"{field}__{lookup}", value)
+
+    def get_term_condition(self, admin_class, search_fields, value):
+        """
+        构建一个词的查询条件，各字段之间是或的关系
+        :param search_fields: [(字段, 查询类型)]
+        """
+        query = Q()
+        query.connector = "OR"
+        for field, lookup in search_fields:
+            condition = self.get_condition(admin_class, field, lookup, value)
+            if condition is not None:
+                query.children.append(condition)
+        return query
+
+    def search(self, admin_class, request, queryset, keyword):
+        search_fields = get_search_fields(admin_class.get_list_search(request))
+        if not search_fields:
+            return queryset
+        field_names = [field for field, lookup in search_fields]
+
+        query = Q()
+        for target, value in parse_search_terms(keyword, field_names):
+            fields = [(field, lookup) for field, lookup in search_fields if target in (None, field)]
+            condition = self.get_term_condition(admin_class, fields, value)
+            if not condition.children:
+                return queryset.none()
+            query &= condition
+
+        return queryset.filter(query)
+
+
+class IndexSearchBackend(DatabaseSearchBackend):
+    """
+    索引搜索基类
+    list_search 中包含类型的字段内容写入索引，通过 save/delete 信号更新索引，跨表字段在关联表数据变化时同步更新
+    已有数据需要执行 python manage.py rebuild_search_index 生成索引
+    关键字过短无法使用索引时 使用数据库查询
+    注意: 只支持整数主键
+    """
+
+    min_length = 2  # 使用索引的最短关键字
+    chunk_size = 1000  # 重建索引时 每次处理的数据条数
+
+    def write(self, admin_class, documents):
+        """
+        写入索引
+        :param documents: {主键: {搜索字段: 内容}}
+        """
+        raise NotImplementedError(f"{self.__class__.__name__}.write() must be implemented")
+
+    def delete(self, admin_class, pks):
+        """
+        删除索引
+        :param pks: 主键列表
+        """
+        raise NotImplementedError(f"{self.__class__.__name__}.delete() must be implemented")
+
+    def clear(self, admin_class):
+        """
+        清空模型的所有索引
+        """
+        raise NotImplementedError(f"{self.__class__.__name__}.clear() must be implemented")
+
+    def match(self, admin_class, value, fields):
+        """
+        使用索引搜索一个词
+        :param fields: 搜索字段
+        :return: Q对象，无法使用索引时返回 None
+        """
+        raise NotImplementedError(f"{self.__class__.__name__}.match() must be implemented")
+
+    def get_index_fields(self, admin_class):
+        """
+        需要写入索引的字段 list_search 中包含类型的字段
+        """
+        return [field for field, lookup in get_search_fields(admin_class.list_search) if lookup == "contains"]
+
+    def get_term_condition(self, admin_class, search_fields, value):
+        index_fields = self.get_index_fields(admin_class)
+        fields = [field for field, lookup in search_fields if lookup == "contains" and field in index_fields]
+        condition = self.match(admin_class, value, fields) if fields else None
+        if condition is None:
+            return super(IndexSearchBackend, self).get_term_condition(admin_class, search_fields, value)
+
+        # 包含类型的字段使用索引，其他字段使用数据库查询
+        other_fields = [(field, lookup) for field, lookup in search_fields if field not in fields]
+        query = super(IndexSearchBackend, self).get_term_condition(admin_class, other_fields, value)
+        query.children.append(condition)
+        return query
+
+    def get_documents(self, admin_class, pks):
+        """
+        获取数据索引字段的内容，多对多等一对多字段的多个值使用空格拼接
+        :return: {主键: {搜索字段: 内容}}
+        """
+        fields = self.get_index_fields(admin_class)
+        documents = {}
+        for row in admin_class.model.objects.filter(pk__in=pks).values_list("pk", *fields):
+            document = documents.setdefault(row[0], {field: [] for field in fields})
+            for field, value in zip(fields, row[1:]):
+                if value not in (None, "") and str(value) not in document[field]:
+                    document[field].append(str(value))
+
+        return {
+            pk: {field: " ".join(values) for field, values in document.items()}
+            for pk, document in documents.items()
+        }
+
+    def index(self, admin_class, pks):
+        """
+        更新指定数据的索引，已删除的数据只删除索引
+        """
+        pks = list(pks)
+        if not pks:
+            return
+
+        using = router.db_for_write(admin_class.model)
+        for start in range(0, len(pks), self.chunk_size):
+            chunk = pks[start:start + self.chunk_size]
+            with transaction.atomic(using=using):
+                self.delete(admin_class, chunk)
+                self.write(admin_class, self.get_documents(admin_class, chunk))
+
+    def rebuild(self, admin_class):
+        """
+        重建模型的所有索引
+        """
+        self.clear(admin_class)
+        pks = admin_class.model.objects.order_by().values_list("pk", flat=True)
+        self.index(admin_class, list(pks.iterator()))
+
+    def register(self, admin_class):
+        model = admin_class.model
+        uid = f"kingadmin_search_{model._meta.label_lower}"
+
+        def on_save(sender, instance, **kwargs):
+            self.index(admin_class, [instance.pk])
+
+        def on_delete(sender, instance, **kwargs):
+            self.delete(admin_class, [instance.pk])
+
+        post_save.connect(on_save, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=uid)
+
+        for field in self.get_index_fields(admin_class):
+            self.register_related(admin_class, field)
+
+    def register_related(self, admin_class, search_field):
+        """
+        跨表搜索字段 关联表数据变化时更新索引
+        eg: Book 的 publisher__name，Publisher 修改名称后更新对应 Book 的索引
+        """
+        model = admin_class.model
+        opts = model._meta
+        parts = search_field.split("__")
+
+        for depth, part in enumerate(parts[:-1], 1):
+            field = opts.get_field(part)
+            if not field.is_relation or field.related_model is None:
+                break
+
+            prefix = "__".join(parts[:depth])
+            uid = f"kingadmin_search_{opts.label_lower}_{prefix}"
+
+            def get_pks(instance, prefix=prefix):
+                return model.objects.filter(**{prefix: instance}).values_list("pk", flat=True)
+
+            def on_related_save(sender, instance, get_pks=get_pks, **kwargs):
+                self.index(admin_class, get_pks(instance))
+
+            def on_related_pre_delete(sender, instance, get_pks=get_pks, **kwargs):
+                instance._kingadmin_search_pks = list(get_pks(instance))
+
+            def on_related_delete(sender, instance, **kwargs):
+                self.index(admin_class, getattr(instance, "_kingadmin_search_pks", []))
+
+            related_model = field.related_model
+            post_save.connect(on_related_save, sender=related_model, weak=False, dispatch_uid=uid)
+            pre_delete.connect(on_related_pre_delete, sender=related_model, weak=False, dispatch_uid=uid)
+            post_delete.connect(on_related_delete, sender=related_model, weak=False, dispatch_uid=uid)
+
+            if field.many_to_many:
+                through = field.remote_field.through if field.concrete else field.through
+
+                def on_m2m_changed(sender, instance, action, pk_set, get_pks=get_pks, **kwargs):
+                    if isinstance(instance, model):
+                        if action.startswith("post_"):
+                            self.index(admin_class, [instance.pk])
+                    elif action == "pre_clear":
+                        instance._kingadmin_search_pks = list(get_pks(instance))
+                    elif action == "post_clear":
+                        self.index(admin_class, getattr(instance, "_kingadmin_search_pks", []))
+                    elif action in ("post_add", "post_remove") and kwargs.get("model") is model:
+                        self.index(admin_class, pk_set or [])
+
+                m2m_changed.connect(on_m2m_changed, sender=through, weak=False, dispatch_uid=uid)
+
+            opts = related_model._meta
+
+
+class InvertedIndexSearchBackend(IndexSearchBackend):
+    """
+    倒排索引搜索 使用 kingadmin.models.SearchToken 表，支持所有数据库
+    内容按空白拆分后 每两个字符为一个词(适用于中文)，关键字的所有词都出现在同一字段中即为匹配
+    """
+
+    def tokenize(self, text):
+        tokens = set()
+        for word in text.lower().split():
+            tokens.update(word[i:i + 2] for i in range(len(word) - 1))
+        return tokens
+
+    def write(self, admin_class, documents):
+        content_type = ContentType.objects.get_for_model(admin_class.model)
+        SearchToken.objects.bulk_create([
+            SearchToken(content_type=content_type, object_id=pk, field=field, token=token)
+            for pk, document in documents.items()
+            for field, text in document.items()
+            for token in self.tokenize(text)
+        ], batch_size=self.chunk_size)
+
+    def delete(self, admin_class, pks):
+        content_type = ContentType.objects.get_for_model(admin_class.model)
+        SearchToken.objects.filter(content_type=content_type, object_id__in=list(pks)).delete()
+
+    def clear(self, admin_class):
+        content_type = ContentType.objects.get_for_model(admin_class.model)
+        SearchToken.objects.filter(content_type=content_type).delete()
+
+    def match(self, admin_class, value, fields):
+        if any(len(word) < self.min_length for word in value.split()):
+            return None
+
+        tokens = self.tokenize(value)
+        content_type = ContentType.objects.get_for_model(admin_class.model)
+        object_ids = SearchToken.objects.filter(
+            content_type=content_type, field__in=fields, token__in=tokens
+        ).values("object_id", "field").annotate(
+            num=Count("token", distinct=True)
+        ).filter(num=len(tokens)).values("object_id")
+
+        return Q(pk__in=object_ids)
+
+
+class SQLiteFTSSearchBackend(IndexSearchBackend):
+    """
+    SQLite FTS5 全文搜索 每个模型一张 fts5 虚拟表，rowid 即数据主键，使用 trigram 分词 支持中文
+    需要 SQLite 3.34 以上版本，list_search 变化后需要重建索引
+    """
+
+    min_length = 3  # trigram 分词 关键字至少3个字符
+
+    def __init__(self):
+        self._tables = set()
+
+    def get_table(self, admin_class):
+        return f"kingadmin_fts_{admin_class.model._meta.db_table}"
+
+    def get_connection(self, admin_class):
+        return connections[router.db_for_write(admin_class.model)]
+
+    def register(self, admin_class):
+        connection = self.get_connection(admin_class)
+        if connection.vendor != "sqlite":
+            raise ImproperlyConfigured(
+                f"SQLiteFTSSearchBackend 只支持 SQLite 数据库，{admin_class.model._meta.label} 使用的是 {connection.vendor}"
+            )
+        if connection.Database.sqlite_version_info < (3, 34):
+            raise ImproperlyConfigured(
+                f"SQLiteFTSSearchBackend 的 trigram 分词需要 SQLite 3.34 以上版本，当前版本 {connection.Database.sqlite_version}"
+            )
+        super().register(admin_class)
+
+    def ensure_table(self, admin_class):
+        """
+        创建 fts5 虚拟表，list_search 变化时重新建表
+        """
+        connection = self.get_connection(admin_class)
+        if (connection.alias, admin_class.model) in self._tables:
+            return
+
+        table = connection.ops.quote_name(self.get_table(admin_class))
+        columns = self.get_index_fields(admin_class)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA table_info({table})")
+            exists = [row[1] for row in cursor.fetchall()]
+            if exists != columns:
+                if exists:
+                    cursor.execute(f"DROP TABLE {table}")
+                cursor.execute(f"CREATE VIRTUAL TABLE {table} USING fts5({', '.join(columns)}, tokenize='trigram')")
+
+        # 建表成功后才记录 失败时下次调用重试
+        self._tables.add((connection.alias, admin_class.model))
+
+    def write(self, admin_class, documents):
+        self.ensure_table(admin_class)
+        connection = self.get_connection(admin_class)
+        table = connection.ops.quote_name(self.get_table(admin_class))
+        columns = self.get_index_fields(admin_class)
+
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} (rowid, {', '.join(columns)}) VALUES (%s{', %s' * len(columns)})",
+                [[pk] + [document[column] for column in columns] for pk, document in documents.items()]
+            )
+
+    def delete(self, admin_class, pks):
+        pks = list(pks)
+        if not pks:
+            return
+
+        self.ensure_table(admin_class)
+        connection = self.get_connection(admin_class)
+        table = connection.ops.quote_name(self.get_table(admin_class))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({', '.join(['%s'] * len(pks))})", pks)
+
+    def clear(self, admin_class):
+        self.ensure_table(admin_class)
+        connection = self.get_connection(admin_class)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {connection.ops.quote_name(self.get_table(admin_class))}")
+
+    def match(self, admin_class, value, fields):
+        if len(value) < self.min_length or self.get_connection(admin_class).vendor != "sqlite":
+            return None
+
+        self.ensure_table(admin_class)
+        table = self.get_connection(admin_class).ops.quote_name(self.get_table(admin_class))
+        phrase = '{%s} : "%s"' % (" ".join(fields), value.replace('"', '""'))
+
+        return Q(pk__in=SubquerySQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [phrase]))
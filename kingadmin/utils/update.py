@@ -0,0 +1,66 @@
+from django.db import router, transaction
+from django.db.models import Case, When, Value, F, Model
+
+
+def get_update_value(field, value):
+    """
+    外键字段使用 字段名_id 更新，值为关联数据的主键
+    :return: (更新使用的字段名, 值)
+    """
+    if field.is_relation and isinstance(value, Model):
+        return field.attname, value.pk
+    return field.attname, value
+
+
+def update_in_chunks(model, pks, values, chunk_size):
+    """
+    所有数据修改为相同的值 每块主键一条 UPDATE 语句，在一个事务中执行
+    :param pks: 主键列表
+    :param values: {字段名: 值}
+    :return: 修改的条数
+    """
+    opts = model._meta
+    values = dict(get_update_value(opts.get_field(name), value) for name, value in values.items())
+    using = router.db_for_write(model)
+    manager = model._base_manager.using(using)
+
+    updated = 0
+    with transaction.atomic(using=using):
+        for start in range(0, len(pks), chunk_size):
+            updated += manager.filter(pk__in=pks[start:start + chunk_size]).update(**values)
+    return updated
+
+
+def bulk_update_rows(model, rows, chunk_size):
+    """
+    每行数据修改为不同的值 每块数据使用 CASE WHEN 一条 UPDATE 语句，在一个事务中执行
+    :param rows: {主键: {字段名: 值}} 每行可以修改不同的字段
+    :return: 修改的条数
+    """
+    opts = model._meta
+    using = router.db_for_write(model)
+    manager = model._base_manager.using(using)
+    pks = list(rows)
+
+    updated = 0
+    with transaction.atomic(using=using):
+        for start in range(0, len(pks), chunk_size):
+            chunk = pks[start:start + chunk_size]
+
+            whens = {}
+            for pk in chunk:
+                for name, value in rows[pk].items():
+                    field = opts.get_field(name)
+                    _, value = get_update_value(field, value)
+                    whens.setdefault(field, []).append(When(pk=pk, then=Value(value, output_field=field)))
+
+            if not whens:
+                continue
+
+            values = {
+                field.attname: Case(*field_whens, default=F(field.attname), output_field=field)
+                for field, field_whens in whens.items()
+            }
+            updated += manager.filter(pk__in=chunk).update(**values)
+
+    return updated
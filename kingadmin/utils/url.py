@@ -0,0 +1,49 @@
+from urllib.parse import quote_plus
+
+
+class FilterLinkBuilder:
+    """
+    条件筛选链接构建
+    除当前筛选字段外的url参数 每次请求只编码一次，每个筛选项的链接只做字符串拼接
+    """
+
+    def __init__(self, params, field):
+        """
+        :param params: request.GET 参数
+        :param field: 当前筛选字段
+        """
+        self.key = quote_plus(field)
+        self.selected = params.getlist(field, []) if params else []
+
+        query = params.copy() if params else None
+        if query and field in query:
+            query.pop(field)
+        self.base = query.urlencode() if query else ""
+        self.selected_encoded = [self.encode(value) for value in self.selected]
+
+    def encode(self, value):
+        return f"{self.key}={quote_plus(str(value))}"
+
+    def join(self, *parts):
+        return "?" + "&".join(part for part in parts if part)
+
+    def all_link(self):
+        """
+        全部 清除当前字段的筛选
+        """
+        return self.join(self.base)
+
+    def single_link(self, value):
+        """
+        单选 只保留当前筛选值
+        """
+        return self.join(self.base, self.encode(value))
+
+    def multiple_link(self, value):
+        """
+        多选 已选中则去掉该值，未选中则追加该值
+        """
+        if value in self.selected:
+            index = self.selected.index(value)
+            return self.join(self.base, *(self.selected_encoded[:index] + self.selected_encoded[index + 1:]))
+        return self.join(self.base, *self.selected_encoded, self.encode(value))
@@ -0,0 +1,55 @@
+from django.core.exceptions import ValidationError
+from django.forms.widgets import Select, SelectMultiple
+
+from kingadmin.settings import admin_settings
+
+
+class AutocompleteMixin:
+    """
+    外键、多对多字段的自动补全 只渲染已选中的选项，其余选项由前端请求关联模型的 autocomplete/ 接口搜索
+    choices 需要是 ModelChoiceField 的 ModelChoiceIterator
+    """
+
+    def __init__(self, url, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs["data-autocomplete"] = self.url
+        attrs["data-search-param"] = admin_settings.SEARCH_PARAM
+        return attrs
+
+    def get_selected_objects(self, values):
+        """
+        只查询已选中的数据
+        """
+        values = [value for value in values if value not in (None, "")]
+        if not values:
+            return []
+
+        field = self.choices.field
+        key = field.to_field_name or "pk"
+        try:
+            return list(field.queryset.filter(**{f"{key}__in": values}))
+        except (ValueError, TypeError, ValidationError):
+            return []
+
+    def optgroups(self, name, value, attrs=None):
+        options = []
+        if not self.is_required and not self.allow_multiple_selected:
+            options.append(self.create_option(name, "", "", False, 0))
+
+        for obj in self.get_selected_objects(value):
+            option_value, label = self.choices.choice(obj)
+            options.append(self.create_option(name, option_value, label, True, len(options)))
+
+        return [(None, options, 0)]
+
+
+class AutocompleteSelect(AutocompleteMixin, Select):
+    pass
+
+
+class AutocompleteSelectMultiple(AutocompleteMixin, SelectMultiple):
+    pass